@@ -166,7 +166,7 @@ Description=Retracer
 User=ubuntu
 Group=ubuntu
 Environment=PYTHONPATH={REPO_LOCATION}/src
-ExecStart=python3 {REPO_LOCATION}/src/retracer.py --config-dir {REPO_LOCATION}/src/retracer/config --sandbox-dir {HOME}/cache --cleanup-debs --cleanup-sandbox --architecture %i --core-storage {HOME}/var --verbose {failed}
+ExecStart=python3 {REPO_LOCATION}/src/retracer.py --config-dir {REPO_LOCATION}/src/retracer/config --sandbox-dir {HOME}/cache --jobs 2 --deb-cache-size 20 --sandbox-size 10 --cleanup-debs --architecture %i --core-storage {HOME}/var --verbose {failed}
 PrivateTmp=yes
 Restart=on-failure
 
@@ -188,6 +188,14 @@ WantedBy=multi-user.target
         check_call(["systemctl", "restart", "retracer@armhf"])
         check_call(["systemctl", "restart", "retracer@i386"])
 
+        logger.info("Configuring retracer timers")
+        setup_systemd_timer(
+            "et-prefetch-debs",
+            "Error Tracker - Warm up the retracer sandboxes",
+            f"{REPO_LOCATION}/src/tools/prefetch_debs.py --config-dir {REPO_LOCATION}/src/retracer/config --sandbox-dir {HOME}/cache --deb-cache-size 20 --sandbox-size 10 --cleanup-debs",
+            "*-*-* *:0/10:00",  # every ten minutes
+        )
+
     def configure_timers(self):
         logger.info("Installing additional timers dependencies")
         check_call(
@@ -207,6 +215,18 @@ WantedBy=multi-user.target
             f"{REPO_LOCATION}/src/tools/unique_users_daily_update.py",
             "*-*-* 00:30:00",  # every day at 00:30
         )
+        setup_systemd_timer(
+            "et-average-crashes-update",
+            "Error Tracker - Average crashes daily update",
+            f"{REPO_LOCATION}/src/tools/average_crashes_update.py",
+            "*-*-* 01:30:00",  # every day at 01:30, after the unique users update
+        )
+        setup_systemd_timer(
+            "et-average-crashes-update-recent",
+            "Error Tracker - Average crashes update for the last days",
+            f"{REPO_LOCATION}/src/tools/average_crashes_update.py --days 2",
+            "*-*-* *:15:00",  # every hour at :15
+        )
         setup_systemd_timer(
             "et-import-bugs",
             "Error Tracker - Import bugs",
@@ -219,6 +239,12 @@ WantedBy=multi-user.target
             f"{REPO_LOCATION}/src/tools/import_team_packages.py",
             "*-*-* 02:30:00",  # every day at 02:30
         )
+        setup_systemd_timer(
+            "et-import-source-packages",
+            "Error Tracker - Import source packages",
+            f"{REPO_LOCATION}/src/tools/import_source_packages.py",
+            "*-*-* 03:30:00",  # every day at 03:30
+        )
         setup_systemd_timer(
             "et-swift-corrupt-core-check",
             "Error Tracker - Swift - Check for corrupt cores",
@@ -234,7 +260,7 @@ WantedBy=multi-user.target
         setup_systemd_timer(
             "et-record-queue-lengths",
             "Error Tracker - AMQP - Record queue lengths",
-            f"{REPO_LOCATION}/src/tools/record_queue_lengths.py --prune-days 15",
+            f"{REPO_LOCATION}/src/tools/record_queue_lengths.py --keep-days 15",
             "*-*-* *:0/5:00",  # every five minutes
         )
 
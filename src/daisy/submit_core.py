@@ -19,12 +19,13 @@
 import logging
 import random
 import socket
+from datetime import datetime, timedelta
 
-from cassandra.cqlengine.query import DoesNotExist
+from cassandra.cqlengine.query import DoesNotExist, LWTException
 
 # from daisy import config
 from daisy.metrics import get_metrics
-from errortracker import amqp_utils, cassandra_schema, config, swift_utils
+from errortracker import amqp_utils, cassandra_schema, config, swift_utils, utils
 
 metrics = get_metrics("daisy.%s" % socket.gethostname())
 logger = logging.getLogger("daisy")
@@ -77,6 +78,27 @@ def write_to_swift(fileobj: bytes, oops_id: str):
     return True
 
 
+def get_oops_fields(oopsid, fields):
+    rows = cassandra_schema.OOPS.objects.filter(key=oopsid.encode(), column1__in=fields)
+    return {row.column1: row.value for row in rows}
+
+
+def count_awaiting_retrace(addr_sig):
+    """How many reports are waiting for `addr_sig` to be retraced, up to the
+    count that makes a difference to the retrace priority."""
+    if not addr_sig:
+        return 0
+    return len(cassandra_schema.AwaitingRetrace.objects.filter(key=addr_sig).limit(10))
+
+
+def get_crash_age(date):
+    try:
+        # Same format as the one in errortracker.oopses.bucket()
+        return datetime.now() - datetime.strptime(date, "%c")
+    except ValueError:
+        return timedelta(0)
+
+
 def submit_core(request, oopsid, arch, system_token):
     try:
         # every OOPS will have a SystemIdentifier
@@ -107,23 +129,38 @@ def submit_core(request, oopsid, arch, system_token):
         # same SAS.
         return msg, 500
 
-    queued = amqp_utils.enqueue(f"{oopsid}:swift", "retrace_%s" % arch)
+    oops = get_oops_fields(oopsid, ["StacktraceAddressSignature", "DistroRelease", "Date"])
+    addr_sig = oops.get("StacktraceAddressSignature", "")
+    queue = utils.get_retrace_queue(
+        arch,
+        oops.get("DistroRelease", ""),
+        count_awaiting_retrace(addr_sig),
+        get_crash_age(oops.get("Date", "")),
+    )
+    queued = amqp_utils.enqueue(f"{oopsid}:swift", queue)
     if not queued:
         # If not written to amqp then write to log file
         msg = "Failure to write to amqp retrace queue %s %s" % (arch, message)
         logger.info(msg)
         metrics.meter("failure.unable_to_queue_retracing_request")
+    elif queue.startswith("retrace_high_"):
+        metrics.meter("submit_core.high_priority")
 
-    try:
-        addr_sig = cassandra_schema.OOPS.get(
-            key=oopsid.encode(), column1="StacktraceAddressSignature"
-        ).value
-    except DoesNotExist:
-        addr_sig = ""
     # N.B. a report without an initial StacktraceAddressSignature won't be
     # written to the retracing index which is correct because there isn't a
     # way to identify similar ones without a SAS.
     if addr_sig and queued:
-        cassandra_schema.Indexes.create(key=b"retracing", column1=addr_sig, value=b"")
+        mark_retracing(addr_sig)
 
     return oopsid, 200
+
+
+def mark_retracing(addr_sig):
+    """Add the SAS to the retracing index, unless it is already there, so as
+    not to reset the claim of a retracer on it (see Retracer.claim_retrace)."""
+    try:
+        cassandra_schema.Indexes.if_not_exists().create(
+            key=b"retracing", column1=addr_sig, value=b""
+        )
+    except LWTException:
+        pass
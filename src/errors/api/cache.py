@@ -0,0 +1,160 @@
+"""Response cache for the API resources.
+
+Most of the API responses are aggregates over days of data that only change
+slowly, but are requested by every visitor of the errors pages. Resources
+opt in by setting `cache_ttl` in their Meta class, and their GET responses are
+then stored in the "api" Django cache (see `errors_api_cache` in the
+errortracker configuration), keyed by the normalised query parameters.
+
+A response is fresh for `cache_ttl` seconds. For another `cache_ttl` seconds
+it is still served as is, but a single background refresh is started so that
+the next visitors get a fresh one without waiting for it (stale while
+revalidate). Requests for a response that isn't in the cache at all wait for
+the one request that is computing it instead of all hitting Cassandra at the
+same time. With the default local memory backend, that coordination is only
+done between the threads of a single process; use memcached to share it
+between processes and hosts.
+
+Cached responses carry an ETag and a Last-Modified header, so that clients
+polling them get a 304 Not Modified until they are recomputed.
+"""
+
+import functools
+import threading
+import time
+from hashlib import sha1
+from urllib.parse import urlencode
+
+from django.core.cache import caches
+from django.http import HttpRequest, HttpResponse
+from django.utils.http import http_date, quote_etag
+
+from daisy import metrics as daisy_metrics
+from errortracker import config
+
+# How long a recomputation may take before other requests stop waiting for it
+# and compute the response themselves.
+LOCK_TIMEOUT = 60
+# How often requests waiting for another one to compute a response check
+# whether it is done.
+POLL_INTERVAL = 0.1
+# The headers of the responses which are cached along with their content,
+# the others are either set again when they are served or are specific to
+# the request.
+CACHED_HEADERS = (
+    "Content-Type",
+    "Content-Disposition",
+    "Content-Language",
+    "Cache-Control",
+    "Vary",
+)
+# The headers of the requests which don't apply to their background refresh
+CONDITIONAL_HEADERS = ("HTTP_IF_MATCH", "HTTP_IF_NONE_MATCH", "HTTP_IF_MODIFIED_SINCE")
+
+
+def get_cache():
+    return caches["api"]
+
+
+def get_cache_key(
+    resource_name: str, request_type: str, response_format: str, request, kwargs
+) -> str:
+    """The cache key of a request, which doesn't depend on the order of the
+    query parameters."""
+    params = sorted((k, sorted(request.GET.getlist(k))) for k in request.GET)
+    kwargs = sorted((k, str(v)) for k, v in kwargs.items() if k != "api_name")
+    key = urlencode([("format", response_format)] + params + kwargs, doseq=True)
+    # memcached limits keys to 250 characters without spaces.
+    return "api:%s:%s:%s" % (resource_name, request_type, sha1(key.encode()).hexdigest())
+
+
+def copy_request(request) -> HttpRequest:
+    """A copy of a GET request, which can still be used once the request was
+    answered, to refresh its response in the background."""
+    copy = HttpRequest()
+    copy.method = request.method
+    copy.path = request.path
+    copy.path_info = request.path_info
+    copy.resolver_match = request.resolver_match
+    copy.META = {k: v for k, v in request.META.items() if k not in CONDITIONAL_HEADERS}
+    copy.GET = request.GET.copy()
+    copy.COOKIES = dict(request.COOKIES)
+    if hasattr(request, "user"):
+        copy.user = request.user
+    return copy
+
+
+def _store(cache, key: str, response, ttl: int):
+    if response.status_code != 200:
+        return response
+    # An error while streaming a response raises here, before anything is
+    # stored or sent.
+    if response.streaming:
+        content = b"".join(response.streaming_content)
+    else:
+        content = response.content
+    entry = {
+        "created": time.time(),
+        "content": content,
+        "headers": {k: response[k] for k in CACHED_HEADERS if response.has_header(k)},
+        "etag": sha1(content).hexdigest(),
+    }
+    # Keep the entry around for the stale period as well.
+    cache.set(key, entry, 2 * ttl)
+    return _to_response(entry)
+
+
+def _to_response(entry):
+    response = HttpResponse(entry["content"])
+    for k, v in entry["headers"].items():
+        response[k] = v
+    # Let clients revalidate their copy with a conditional request.
+    response["ETag"] = quote_etag(entry["etag"])
+    response["Last-Modified"] = http_date(entry["created"])
+    return response
+
+
+def _compute(cache, key: str, compute, ttl: int):
+    try:
+        return _store(cache, key, compute(), ttl)
+    finally:
+        cache.delete(key + ":lock")
+
+
+def _refresh(cache, key: str, compute, ttl: int):
+    try:
+        _compute(cache, key, compute, ttl)
+    except Exception:
+        config.logger.exception("Unable to refresh the cached API response %s", key)
+
+
+def cached_response(key: str, request, compute, ttl: int):
+    """Return the cached response for `key`, calling `compute` with the
+    request to get a new one if needed."""
+    metrics = daisy_metrics.get_metrics("errors")
+    cache = get_cache()
+    lock_key = key + ":lock"
+    deadline = time.time() + LOCK_TIMEOUT
+    while True:
+        entry = cache.get(key)
+        if entry is not None:
+            if time.time() - entry["created"] < ttl:
+                metrics.meter("api_cache.hit")
+            else:
+                metrics.meter("api_cache.stale")
+                if cache.add(lock_key, True, LOCK_TIMEOUT):
+                    # The request is answered by the time the refresh runs.
+                    refresh = functools.partial(compute, copy_request(request))
+                    threading.Thread(
+                        target=_refresh, args=(cache, key, refresh, ttl), daemon=True
+                    ).start()
+            return _to_response(entry)
+
+        if cache.add(lock_key, True, LOCK_TIMEOUT):
+            metrics.meter("api_cache.miss")
+            return _compute(cache, key, functools.partial(compute, request), ttl)
+        if time.time() > deadline:
+            metrics.meter("api_cache.lock_timeout")
+            return compute(request)
+        # Someone else is already computing that response, wait for it.
+        time.sleep(POLL_INTERVAL)
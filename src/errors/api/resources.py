@@ -1,4 +1,5 @@
 # Treat strings as UTF-8 instead of ASCII
+import calendar
 import datetime
 import json as simplejson
 from collections import OrderedDict
@@ -10,17 +11,27 @@ from urllib.parse import quote, unquote
 
 import apt
 from django.core.serializers import json
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
 from lazr.restfulclient.errors import HTTPError as LPHTTPError
 from tastypie import fields
 from tastypie.authentication import Authentication, SessionAuthentication
 from tastypie.authorization import Authorization, DjangoAuthorization
-from tastypie.exceptions import NotFound
+from tastypie.exceptions import BadRequest, NotFound
 from tastypie.resources import Resource
 from tastypie.serializers import Serializer
+from tastypie.utils.mime import build_content_type
 
 from errors import cassie
+from errors.api import cache
 from errortracker import config, launchpad
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 release_color_mapping = OrderedDict()
 
 # If you add or change colors here, also update the colors in
@@ -138,20 +149,61 @@ class APIAuthentication(Authentication):
         return False
 
 
-class PrettyJSONSerializer(Serializer):
+def _orjson_default(obj):
+    # orjson only knows about the exact built-in types, not about subclasses
+    # like numpy.float64, nor numpy.int64.
+    if isinstance(obj, float):
+        return float(obj)
+    if hasattr(obj, "item"):
+        return obj.item()
+    return json.DjangoJSONEncoder().default(obj)
+
+
+class JSONSerializer(Serializer):
+    """Compact JSON, using orjson when it is available. The output is only
+    indented when the "pretty" option is set, see ErrorsResource.serialize()."""
+
     json_indent = 2
 
     def to_json(self, data, options=None):
         options = options or {}
         data = self.to_simple(data, options)
+        pretty = options.get("pretty", False)
+        if orjson is not None:
+            option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+            if pretty:
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(data, default=_orjson_default, option=option).decode()
         return simplejson.dumps(
             data,
             cls=json.DjangoJSONEncoder,
             sort_keys=True,
             ensure_ascii=False,
-            indent=self.json_indent,
+            indent=self.json_indent if pretty else None,
+            separators=None if pretty else (",", ":"),
         )
 
+    def stream_json(self, data, collection_name="objects", options=None):
+        """Serialise a list response like to_json(), one object at a time,
+        as it is consumed."""
+        try:
+            separator = "{"
+            for key in sorted(data):
+                yield separator + self.to_json(key, options) + ":"
+                separator = ","
+                if key != collection_name:
+                    yield self.to_json(data[key], options)
+                    continue
+                yield "["
+                for i, obj in enumerate(data[key]):
+                    yield ("," if i else "") + self.to_json(obj, options)
+                yield "]"
+            yield "}"
+        except Exception:
+            # The response is already on its way, with a 200 status.
+            config.logger.exception("Unable to serialise a streamed API response")
+            raise
+
 
 class ResultObject(object):
     def __init__(self, initial=None):
@@ -171,18 +223,120 @@ class ResultObject(object):
 
 
 class ErrorsResource(Resource):
-    pass
+    def serialize(self, request, data, format, options=None):
+        options = options or {}
+        options["pretty"] = "pretty" in request.GET
+        return super().serialize(request, data, format, options)
+
+    def streams_lists(self, request):
+        """Whether the lists of objects are streamed to the client, which is
+        only done for compact JSON."""
+        return (
+            self.determine_format(request) == "application/json"
+            and isinstance(self._meta.serializer, JSONSerializer)
+            and "pretty" not in request.GET
+        )
+
+    def get_list(self, request, **kwargs):
+        if not self.streams_lists(request):
+            return super().get_list(request, **kwargs)
+
+        # Like Resource.get_list(), but the objects are only dehydrated and
+        # serialised as the response is sent, instead of building the whole
+        # document in memory first.
+        base_bundle = self.build_bundle(request=request)
+        objects = self.obj_get_list(bundle=base_bundle, **self.remove_api_resource_names(kwargs))
+        sorted_objects = self.apply_sorting(objects, options=request.GET)
+        collection_name = self._meta.collection_name
+        paginator = self._meta.paginator_class(
+            request.GET,
+            sorted_objects,
+            resource_uri=self.get_resource_uri(),
+            limit=self._meta.limit,
+            max_limit=self._meta.max_limit,
+            collection_name=collection_name,
+        )
+        to_be_serialized = paginator.page()
+        to_be_serialized[collection_name] = (
+            self.full_dehydrate(self.build_bundle(obj=obj, request=request), for_list=True)
+            for obj in to_be_serialized[collection_name]
+        )
+        to_be_serialized = self.alter_list_data_to_serialize(request, to_be_serialized)
+        return StreamingHttpResponse(
+            self._meta.serializer.stream_json(to_be_serialized, collection_name),
+            content_type=build_content_type("application/json"),
+        )
+
+    def get_bucket_id(self, request, kwargs):
+        """The bucket whose data the response is made of, if any. Its last
+        write is used to answer conditional requests without computing the
+        response."""
+        return None
+
+    def dispatch(self, request_type, request, **kwargs):
+        if request.method != "GET":
+            return super().dispatch(request_type, request, **kwargs)
+
+        def compute(request):
+            return super(ErrorsResource, self).dispatch(request_type, request, **kwargs)
+
+        etag = None
+        last_modified = None
+        bucketid = self.get_bucket_id(request, kwargs)
+        last_write = cassie.get_bucket_last_write(bucketid) if bucketid else None
+        key_kwargs = kwargs
+        if last_write is not None:
+            last_modified = calendar.timegm(last_write.utctimetuple())
+            # Last-Modified is in whole seconds, but there can be several
+            # writes in a second.
+            key_kwargs = dict(kwargs, last_write=last_write.isoformat())
+        key = cache.get_cache_key(
+            self._meta.resource_name,
+            request_type,
+            self.determine_format(request),
+            request,
+            key_kwargs,
+        )
+        if last_write is not None:
+            etag = quote_etag(sha1(key.encode()).hexdigest())
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is not None:
+                return response
+
+        ttl = self._meta.cache_ttl
+        if ttl:
+            response = cache.cached_response(key, request, compute, ttl)
+        else:
+            response = compute(request)
+        if response.status_code != 200:
+            return response
+        if etag is not None:
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+        elif response.has_header("ETag"):
+            last_modified = parse_http_date_safe(response.get("Last-Modified"))
+        else:
+            return response
+        return get_conditional_response(
+            request, etag=response["ETag"], last_modified=last_modified, response=response
+        )
 
 
 class ErrorsMeta:
     object_class = ResultObject
-    serializer = PrettyJSONSerializer()
+    serializer = JSONSerializer()
     # Do not include resource_uri = '' on each date
     include_resource_uri = False
     allowed_methods = ["get"]
     # The default number of rows to fetch from Cassandra
     limit = 0
     max_limit = 30 * 12
+    # How long GET responses are served from the API cache, in seconds, see
+    # errors/api/cache.py. Only set it on resources whose responses do not
+    # depend on the user.
+    cache_ttl = 0
 
 
 class RetraceResultResource(ErrorsResource):
@@ -191,6 +345,7 @@ class RetraceResultResource(ErrorsResource):
 
     class Meta(ErrorsMeta):
         resource_name = "retracers-results"
+        cache_ttl = 60 * 60
 
     def obj_get_list(self, bundle):
         limit = int(bundle.request.GET.get("limit", self._meta.limit))
@@ -211,6 +366,7 @@ class RetraceQueueLengthResource(ErrorsResource):
 
     class Meta(ErrorsMeta):
         resource_name = "retracer-queue-length"
+        cache_ttl = 5 * 60
 
     def obj_get_list(self, bundle):
         hours = int(bundle.request.GET.get("hours", 48))
@@ -234,6 +390,7 @@ class RetraceAverageProcessingTimeResource(ErrorsResource):
 
     class Meta(ErrorsMeta):
         resource_name = "retracers-average-processing-time"
+        cache_ttl = 60 * 60
 
     def obj_get_list(self, bundle):
         limit = int(bundle.request.GET.get("limit", self._meta.limit))
@@ -250,6 +407,7 @@ class InstanceCountResource(ErrorsResource):
 
     class Meta(ErrorsMeta):
         resource_name = "instances-count"
+        cache_ttl = 15 * 60
 
     def obj_get_list(self, bundle):
         limit = int(bundle.request.GET.get("limit", self._meta.limit))
@@ -278,6 +436,7 @@ class ProblemCountResource(ErrorsResource):
 
     class Meta(ErrorsMeta):
         resource_name = "problems-count"
+        cache_ttl = 15 * 60
 
     def obj_get_list(self, bundle):
         limit = int(bundle.request.GET.get("limit", self._meta.limit))
@@ -344,6 +503,7 @@ class MostCommonProblemsResource(ErrorsResource):
 
     class Meta(ErrorsMeta):
         resource_name = "most-common-problems"
+        cache_ttl = 15 * 60
 
     def obj_get_list(self, bundle):
         release = bundle.request.GET.get("release", None)
@@ -372,16 +532,16 @@ class MostCommonProblemsResource(ErrorsResource):
                 packages = binary_packages
             else:
                 try:
-                    subscribed_pkgs = launchpad.get_subscribed_packages(user)
+                    subscribed_srcs = launchpad.get_subscribed_source_packages(user)
                 except (HTTPError, KeyError, LPHTTPError):
                     raise NotFound("%s was not found." % user)
 
-                for sub_pkg in subscribed_pkgs:
+                for sub_pkg in cassie.get_binaries_in_source_packages(subscribed_srcs):
                     packages.append(sub_pkg)
         # XXX: is returning source package info if package is a binary package
         # the best?
-        elif package and launchpad.is_source_package(package):
-            for binary in launchpad.get_binaries_in_source_package(package, release):
+        elif package and cassie.is_source_package(package):
+            for binary in cassie.get_binaries_in_source_package(package, release):
                 packages.append(binary)
             # It is non-trivial to find binaries for PPA packages so just add
             # the source package and hope the binary has the same name
@@ -389,7 +549,7 @@ class MostCommonProblemsResource(ErrorsResource):
             if package not in packages:
                 packages.append(package)
         elif packageset:
-            for package in launchpad.get_packages_in_packageset_name(release, packageset):
+            for package in cassie.get_packages_in_packageset(release, packageset):
                 packages.append(package)
         else:
             packages.append(package)
@@ -434,19 +594,17 @@ class MostCommonProblemsResource(ErrorsResource):
         buckets_combined = buckets_combined[start:finish]
 
         metadata = cassie.get_metadata_for_buckets([x[0] for x in buckets_combined], release)
+        hashes = {bucket: sha1(bucket.encode()).hexdigest() for bucket, _ in buckets_combined}
+        problems = cassie.get_problems_for_hashes(hashes.values())
         rank = 1
         for bucket, count in buckets_combined:
             try:
                 m = metadata[bucket]
             except KeyError:
                 m = {}
+            # Buckets created before the Source field was written in
+            # BucketMetadata have been fixed by tools/backfill_bucket_source.py
             srcpkg = m.get("Source", "")
-            if not srcpkg:
-                # Because we weren't always writing the Source field in
-                # BucketMetadata, there are going to be a few buckets with an
-                # empty value here. Use the old method for looking up the
-                # package for now.
-                srcpkg, bucket_version = cassie.get_package_for_bucket(bucket)
             if not srcpkg and not snap:
                 # if we still don't have a package it is a snap crash or
                 # something else
@@ -458,8 +616,8 @@ class MostCommonProblemsResource(ErrorsResource):
             if first_appearance:
                 if m.get("FirstSeen", "") != version:
                     continue
-            hashed = sha1(bucket.encode()).hexdigest()
-            if cassie.get_problem_for_hash(hashed):
+            hashed = hashes[bucket]
+            if hashed in problems:
                 href = "problem/%s" % hashed
             else:
                 href = "bucket/?id=%s" % quote(bucket)
@@ -590,9 +748,10 @@ class SystemCrashesResource(ErrorsResource):
         limit = int(bundle.request.GET.get("limit", 50))
         cols = ["Date", "ProblemType", "Package", "ExecutablePath"]
         crashes = cassie.get_user_crashes(system_id, start=cursor, limit=limit)
+        details = cassie.get_crashes([crash for crash, _ in crashes], columns=cols)
         results = []
         for crash, ts in crashes:
-            d = cassie.get_crash(str(crash), columns=cols)
+            d = details[str(crash)]
             program = split_package_and_version(d.get("Package", ""))[0]
             if not program:
                 program = d.get("ExecutablePath", "")
@@ -644,6 +803,90 @@ class RateOfCrashesResource(ErrorsResource):
         return [ResultObject(result)]
 
 
+class RatesOfCrashesResource(ErrorsResource):
+    """The package-rate-of-crashes results of many packages at once.
+
+    POST a JSON object like:
+    {
+        "date": "20251101",
+        "exclude_proposed": true,
+        "packages": [
+            {
+                "release": "Ubuntu 24.04",
+                "package": "zsh",
+                "old_version": "5.9-6ubuntu2",
+                "new_version": "5.9-6ubuntu3",
+                "phased_update_percentage": "10"
+            },
+            ...
+        ]
+    }
+    """
+
+    release = fields.CharField(attribute="release", readonly=True)
+    package = fields.CharField(attribute="package", readonly=True)
+    old_version = fields.CharField(attribute="old_version", readonly=True)
+    new_version = fields.CharField(attribute="new_version", readonly=True)
+    increase = fields.BooleanField(attribute="increase", null=True, readonly=True)
+    difference = fields.IntegerField(attribute="difference", null=True, readonly=True)
+    web_link = fields.CharField(attribute="web_link", null=True, readonly=True)
+    previous_period_in_days = fields.IntegerField(
+        attribute="previous_period_in_days", null=True, readonly=True
+    )
+    previous_average = fields.IntegerField(attribute="previous_average", null=True, readonly=True)
+
+    # The maximum number of packages in a single request
+    max_packages = 1000
+
+    class Meta(ErrorsMeta):
+        resource_name = "package-rates-of-crashes"
+        allowed_methods = ["post"]
+        authentication = Authentication()
+
+    def post_list(self, request, **kwargs):
+        data = self.deserialize(
+            request,
+            request.body,
+            format=request.META.get("CONTENT_TYPE", "application/json"),
+        )
+        try:
+            packages = [
+                (
+                    p["release"],
+                    p["package"],
+                    p["old_version"],
+                    p["new_version"],
+                    p.get("phased_update_percentage"),
+                )
+                for p in data["packages"]
+            ]
+            date = data["date"]
+        except (KeyError, TypeError):
+            raise BadRequest("Expected a date and a list of packages.")
+        if len(packages) > self.max_packages:
+            raise BadRequest("At most %d packages can be requested at once." % self.max_packages)
+
+        rates = cassie.get_package_crash_rates(
+            packages,
+            date,
+            request.build_absolute_uri("/"),
+            bool(data.get("exclude_proposed", False)),
+        )
+        objects = []
+        for (release, package, old_version, new_version, _), rate in zip(packages, rates):
+            rate.update(
+                {
+                    "release": release,
+                    "package": package,
+                    "old_version": old_version,
+                    "new_version": new_version,
+                }
+            )
+            bundle = self.build_bundle(obj=ResultObject(rate), request=request)
+            objects.append(self.full_dehydrate(bundle))
+        return self.create_response(request, {"objects": objects})
+
+
 class PackageVersionNewBuckets(ErrorsResource):
     function = fields.CharField(attribute="function", readonly=True)
     web_link = fields.CharField(attribute="web_link", readonly=True)
@@ -699,6 +942,7 @@ class AverageCrashesResource(ErrorsResource):
 
     class Meta(ErrorsMeta):
         resource_name = "average-crashes"
+        cache_ttl = 60 * 60
 
     def obj_get_list(self, bundle):
         release = bundle.request.GET.get("release", None)
@@ -746,13 +990,27 @@ class AverageCrashesResource(ErrorsResource):
             else:
                 releases = [(release, "#000000")]
 
+        # The series without package or version are the ones of the front
+        # page, and are materialised by tools/average_crashes_update.py.
+        if not field:
+            fields = [r for r, _ in releases]
+            fields += ["RecoverableProblem:" + r for r, _ in releases]
+            precomputed = cassie.get_precomputed_average_crashes(fields, 360)
+        else:
+            precomputed = {}
+
+        def get_average_crashes(f, r):
+            if f in precomputed:
+                return precomputed[f]
+            return cassie.get_average_crashes(f, r, 360)
+
         output = []
         for r, color in releases:
             f = "%s:%s" % (r, field) if field else r
             if r != "Ubuntu 12.04":
                 standards_color = precise_standards_color_mapping[r]
-                problems = cassie.get_average_crashes(f, r, 360)
-                recoverables = cassie.get_average_crashes("RecoverableProblem:" + f, r, 360)
+                problems = get_average_crashes(f, r)
+                recoverables = get_average_crashes("RecoverableProblem:" + f, r)
 
                 # Combine the Crash and RecoverableProblem data.
                 combined = {}
@@ -779,7 +1037,7 @@ class AverageCrashesResource(ErrorsResource):
                 res = [{"x": result[0] * 1000, "y": result[1]} for result in problems]
                 output.append(ResultObject({"key": r, "values": res, "color": color}))
             else:
-                results = cassie.get_average_crashes(f, r, 360)
+                results = get_average_crashes(f, r)
                 res = [{"x": result[0] * 1000, "y": result[1]} for result in results]
                 output.append(ResultObject({"key": r, "values": res, "color": color}))
         return output
@@ -792,6 +1050,7 @@ class AverageInstancesResource(ErrorsResource):
 
     class Meta(ErrorsMeta):
         resource_name = "average-instances"
+        cache_ttl = 60 * 60
 
     def obj_get_list(self, bundle):
         bucketid = unquote(bundle.request.GET.get("id", None))
@@ -823,14 +1082,7 @@ class ReportsStateResource(ErrorsResource):
         bundle = self.full_hydrate(bundle)
         reports = bundle.data["reports"]
         release = bundle.data.get("release", None)
-        result = {}
-        for report in reports:
-            launchpad.bug_is_fixed(report, release)
-            result[report] = (
-                launchpad.bug_is_fixed(report, release),
-                launchpad.bug_get_master_id(report),
-            )
-        bundle.obj.reports = result
+        bundle.obj.reports = launchpad.get_bugs_state(reports, release)
         return bundle
 
     def get_resource_uri(self, bundle_or_obj):
@@ -929,16 +1181,21 @@ class InstancesResource(ErrorsResource):
     class Meta(ErrorsMeta):
         resource_name = "instances"
 
+    def get_bucket_id(self, request, kwargs):
+        bucketid = request.GET.get("id", None)
+        return unquote(bucketid) if bucketid else None
+
     def obj_get_list(self, bundle):
         bucketid = unquote(bundle.request.GET.get("id", None))
         cursor = bundle.request.GET.get("start", None)
         cols = ["DistroRelease", "Package", "Architecture"]
-        gen = cassie.get_crashes_for_bucket(bucketid, start=cursor)
+        oopses = cassie.get_crashes_for_bucket(bucketid, start=cursor)
+        details = cassie.get_crashes(oopses, columns=cols)
         results = []
-        for oops in gen:
+        for oops in oopses:
             ts = (oops.time - 0x01B21DD213814000) * 100 / 1e9
             ts = datetime.datetime.utcfromtimestamp(ts)
-            d = cassie.get_crash(str(oops), columns=cols)
+            d = details[str(oops)]
             ver = split_package_and_version(d.get("Package", ""))[1]
             results.append(
                 ResultObject(
@@ -994,8 +1251,12 @@ class VersionsResource(ErrorsResource):
 
     class Meta(ErrorsMeta):
         resource_name = "versions"
+        cache_ttl = 15 * 60
 
-    def update(self, results, version, release, codename, total, src_pkg=None):
+    def get_bucket_id(self, request, kwargs):
+        return request.GET.get("id", None)
+
+    def update(self, results, version, codename, total, pocket=None):
         if not results.get(version):
             results[version] = ResultObject({})
         if not results[version]._data.get(codename):
@@ -1006,8 +1267,7 @@ class VersionsResource(ErrorsResource):
         results[version]._data["version"] = version
         # counts for derivatives are lumped together so don't check for the
         # pocket.
-        if total != 0 and src_pkg and codename != "derivatives":
-            pocket = launchpad.get_pocket_for_source_version(src_pkg, version, release)
+        if total != 0 and pocket is not None and codename != "derivatives":
             # The errors bucket page uses rtm_1409 as the key.
             if codename == "rtm-14.09":
                 codename = "rtm_1409"
@@ -1020,6 +1280,14 @@ class VersionsResource(ErrorsResource):
         bucketid = bundle.request.GET.get("id", None)
         vers = cassie.get_versions_for_bucket(bucketid)
         src_pkg = cassie.get_source_package_for_bucket(bucketid)
+        # Look up the pockets of all the versions at once.
+        pockets = {}
+        if src_pkg:
+            pockets = launchpad.get_pockets_for_source_versions(
+                (src_pkg, version, release)
+                for (release, version), total in vers.items()
+                if total != 0 and release in codenames
+            )
         results = {}
         # store package versions for later sorting
         versions = []
@@ -1029,9 +1297,10 @@ class VersionsResource(ErrorsResource):
             else:
                 codename = "derivatives"
             versions.append(version)
-            self.update(results, version, release, codename, total, src_pkg)
+            pocket = pockets.get((src_pkg, version, release))
+            self.update(results, version, codename, total, pocket)
             # Produce totals for all Ubuntu releases as the last row.
-            self.update(results, "All versions", release, codename, total)
+            self.update(results, "All versions", codename, total)
         versions.sort(key=cmp_to_key(apt.apt_pkg.version_compare))
         if vers:
             versions.append("All versions")
@@ -1085,30 +1354,22 @@ class BucketResource(ErrorsResource):
     class Meta(ErrorsMeta):
         resource_name = "bucket"
 
+    def get_bucket_id(self, request, kwargs):
+        return kwargs.get("pk")
+
     def obj_get(self, bundle, **kwargs):
         bucket_id = kwargs["pk"]
-        if not cassie.bucket_exists(bucket_id):
+        summary = cassie.get_bucket_summary(bucket_id)
+        if summary is None:
             raise NotFound("Bucket with ID '%s' not found." % bucket_id)
 
-        source_package = (
-            cassie.get_source_package_for_bucket(bucket_id) or "unknown package"
-        )
-        metadata = cassie.get_metadata_for_bucket(bucket_id)
-        traceback = cassie.get_traceback_for_bucket(bucket_id)
-
-        if not traceback:
-            stacktrace, thread_stacktrace = cassie.get_stacktrace_for_bucket(bucket_id)
-        else:
-            stacktrace = None
-            thread_stacktrace = None
-
         return ResultObject(
             {
                 "bucket_id": bucket_id,
-                "source_package": source_package,
-                "metadata": metadata,
-                "traceback": traceback,
-                "stacktrace": stacktrace,
-                "thread_stacktrace": thread_stacktrace,
+                "source_package": summary["source_package"] or "unknown package",
+                "metadata": summary["metadata"],
+                "traceback": summary["traceback"],
+                "stacktrace": summary["stacktrace"],
+                "thread_stacktrace": summary["thread_stacktrace"],
             }
         )
@@ -19,6 +19,7 @@ from .resources import (
     PackageVersionNewBuckets,
     ProblemCountResource,
     RateOfCrashesResource,
+    RatesOfCrashesResource,
     ReleasePackageVersionPockets,
     ReportsStateResource,
     RetraceAverageProcessingTimeResource,
@@ -41,6 +42,7 @@ v1_api.register(CreateBugResource())
 v1_api.register(BinaryPackageVersionsResource())
 v1_api.register(SystemCrashesResource())
 v1_api.register(RateOfCrashesResource())
+v1_api.register(RatesOfCrashesResource())
 v1_api.register(InstanceResource())
 v1_api.register(AverageCrashesResource())
 v1_api.register(ReportsStateResource())
@@ -1,30 +1,34 @@
 import datetime
 import time
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from uuid import UUID
 
 import distro_info
 import numpy
+from cassandra import InvalidRequest
 from cassandra.util import datetime_from_uuid1
 
-from errortracker import cassandra, config, utils
+from errortracker import cassandra, config, oopses, utils
 from errortracker.cassandra_schema import (
     OOPS,
+    AverageCrashes,
     Bucket,
+    BucketLastWrites,
     BucketMetadata,
     BucketRetraceFailureReason,
     BucketVersionsCount,
-    BucketVersionSystems2,
     BugToCrashSignatures,
     Counters,
-    CountersForProposed,
     DayBucketsCount,
     DayOOPS,
     DoesNotExist,
     ErrorsByRelease,
     Hashes,
     Indexes,
+    PackagesetPackages,
     RetraceStats,
+    SourceBinaryPackages,
     SourceVersionBuckets,
     Stacktrace,
     SystemImages,
@@ -35,6 +39,26 @@ from errortracker.cassandra_schema import (
 
 session = cassandra.cassandra_session
 
+# How long the summary of a bucket is cached, in seconds
+BUCKET_SUMMARY_TTL = 60
+# The Indexes row recording how many days of the average crashes series of
+# each field were materialised by the last full run of
+# tools/average_crashes_update.py
+AVERAGE_CRASHES_DAYS = b"average_crashes_days"
+# How many independent lookups are made at the same time by the functions
+# assembling several of them.
+LOOKUP_CONCURRENCY = 8
+
+_bucket_summaries = utils.TTLCache(ttl=BUCKET_SUMMARY_TTL, maxsize=1024)
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=LOOKUP_CONCURRENCY)
+    return _executor
+
 
 def _split_into_dictionaries(original):
     value = {}
@@ -161,11 +185,13 @@ def get_bucket_counts(
             keys.append(key)
 
     results = {}
-    for key in keys:
-        rows = list(DayBucketsCount.objects.filter(key=key.encode()).all())
+    for rows in cassandra.execute_concurrent(
+        'SELECT column1, value FROM {keyspace}."DayBucketsCount" WHERE key = ?',
+        [(key.encode(),) for key in keys],
+    ):
         for row in rows:
-            column = row.column1
-            count = row.value
+            column = row["column1"]
+            count = row["value"]
             if not show_failed and column.startswith("failed"):
                 continue
             try:
@@ -262,6 +288,51 @@ def get_crash(oopsid, columns=None):
         return oops
 
 
+def get_crashes(oopsids, columns=None):
+    """Like get_crash(), for many crashes at once. The crashes are read
+    concurrently, and their crash signatures are looked up with a single
+    query. Returns a dict of the crashes by OOPS ID, empty for the ones that
+    don't exist."""
+    oopsids = [str(oopsid) for oopsid in oopsids]
+    if columns:
+        query = 'SELECT column1, value FROM {keyspace}."OOPS" WHERE key = ? AND column1 IN ?'
+        parameters = [(oopsid.encode(), list(columns)) for oopsid in oopsids]
+    else:
+        query = 'SELECT column1, value FROM {keyspace}."OOPS" WHERE key = ?'
+        parameters = [(oopsid.encode(),) for oopsid in oopsids]
+    results = cassandra.execute_concurrent(query, parameters)
+
+    crashes = {}
+    by_SAS = {}
+    for oopsid, rows in zip(oopsids, results):
+        oops = {row["column1"]: row["value"] for row in rows}
+        crashes[oopsid] = oops
+        if "StacktraceAddressSignature" in oops:
+            if oops["StacktraceAddressSignature"]:
+                by_SAS.setdefault(oops["StacktraceAddressSignature"], []).append(oops)
+        elif "DuplicateSignature" in oops:
+            oops["SAS"] = oops["DuplicateSignature"]
+
+    if by_SAS:
+        rows = cassandra.execute_concurrent(
+            'SELECT column1, value FROM {keyspace}."Indexes" WHERE key = ? AND column1 IN ?',
+            [(b"crash_signature_for_stacktrace_address_signature", list(by_SAS))],
+        )[0]
+        for row in rows:
+            value = row["value"].decode() if isinstance(row["value"], bytes) else row["value"]
+            for oops in by_SAS[row["column1"]]:
+                oops["SAS"] = value
+    return crashes
+
+
+def get_bucket_last_write(bucketid: str):
+    """When the data of a bucket last changed, or None if unknown."""
+    try:
+        return BucketLastWrites.get(key=bucketid).value
+    except DoesNotExist:
+        return None
+
+
 def get_traceback_for_bucket(bucketid):
     # TODO fetching a crash ID twice, once here and once in get_stacktrace, is
     # a bit rubbish, but we'll write the stacktrace into the bucket at some
@@ -306,6 +377,49 @@ def get_stacktrace_for_bucket(bucketid: str):
     return (None, None)
 
 
+def _get_traces_for_bucket(bucketid: str):
+    traceback = get_traceback_for_bucket(bucketid)
+    if traceback:
+        return traceback, None, None
+    stacktrace, thread_stacktrace = get_stacktrace_for_bucket(bucketid)
+    return traceback, stacktrace, thread_stacktrace
+
+
+def get_bucket_summary(bucketid: str):
+    """Everything the bucket page and API show about a bucket, or None if it
+    doesn't exist.
+
+    The independent lookups are made concurrently, and the summary is cached
+    for BUCKET_SUMMARY_TTL seconds, or until the bucket is next written to."""
+    # The writes can happen in other processes, so the cached summaries can't
+    # be dropped when they do.
+    key = (bucketid, get_bucket_last_write(bucketid))
+    summary = _bucket_summaries.get(key)
+    if summary is not None:
+        return summary
+
+    executor = _get_executor()
+    exists = executor.submit(bucket_exists, bucketid)
+    traces = executor.submit(_get_traces_for_bucket, bucketid)
+    metadata = executor.submit(get_metadata_for_bucket, bucketid)
+    failuredata = executor.submit(get_retrace_failure_for_bucket, bucketid)
+    source_package = executor.submit(get_source_package_for_bucket, bucketid)
+    if not exists.result():
+        return None
+
+    traceback, stacktrace, thread_stacktrace = traces.result()
+    summary = {
+        "source_package": source_package.result(),
+        "metadata": metadata.result(),
+        "retrace_failure": failuredata.result(),
+        "traceback": traceback,
+        "stacktrace": stacktrace,
+        "thread_stacktrace": thread_stacktrace,
+    }
+    _bucket_summaries.set(key, summary)
+    return summary
+
+
 def get_retracer_count(date: str):
     try:
         result = RetraceStats.get_as_dict(key=date.encode())
@@ -316,50 +430,69 @@ def get_retracer_count(date: str):
 
 def get_retracer_counts(start, finish):
     dates = _get_range_of_dates(start, finish)
-    results = {}
-    for date in dates:
-        try:
-            result = RetraceStats.get_as_dict(key=date.encode())
-            results[date] = result
-        except DoesNotExist:
-            pass
-    return ((date, _split_into_dictionaries(results[date])) for date in results)
+    results = cassandra.execute_concurrent(
+        'SELECT column1, value FROM {keyspace}."RetraceStats" WHERE key = ?',
+        [(date.encode(),) for date in dates],
+    )
+    return (
+        (date, _split_into_dictionaries({row["column1"]: row["value"] for row in rows}))
+        for date, rows in zip(dates, results)
+    )
 
 
 def get_retracer_means(start, finish):
     dates = _get_range_of_dates(start, finish)
-    results = list()
-    for date in dates:
-        result = {}
-        for release in distro_info.UbuntuDistroInfo().supported(result="object"):
-            release = "Ubuntu " + release.version.replace(" LTS", "")
-            result[release] = {}
-            for arch in ["amd64", "arm64", "armhf", "i386"]:
-                try:
-                    key = f"{date}:{release}:{arch}"
-                    timings = Indexes.get_as_dict(key=b"mean_retracing_time", column1=key)
-                    result[release][arch] = timings[key]
-                except (DoesNotExist, IndexError):
-                    pass
-        results.append((date, result))
+    releases = [
+        "Ubuntu " + release.version.replace(" LTS", "")
+        for release in distro_info.UbuntuDistroInfo().supported(result="object")
+    ]
+    archs = ["amd64", "arm64", "armhf", "i386"]
+    results = [(date, {release: {} for release in releases}) for date in dates]
+    if not dates:
+        return results
+    # One slice of the days for each release and architecture
+    keys = [(release, arch) for release in releases for arch in archs]
+    slices = cassandra.execute_concurrent(
+        'SELECT column1, value FROM {keyspace}."RetracingTime" '
+        "WHERE key = ? AND column1 >= ? AND column1 <= ?",
+        [("%s:%s" % key, dates[-1], dates[0]) for key in keys],
+    )
+    by_date = dict(results)
+    for (release, arch), rows in zip(keys, slices):
+        for row in rows:
+            by_date[row["column1"]][release][arch] = row["value"]
     return results
 
 
 def get_crash_count(start, finish, release=None):
     dates = _get_range_of_dates(start, finish)
-    for date in dates:
+    if release:
+        key = "oopses:%s" % release
+    else:
+        key = "oopses"
+    results = cassandra.execute_concurrent(
+        'SELECT value FROM {keyspace}."Counters" WHERE key = ? AND column1 = ?',
+        [(key.encode(), date) for date in dates],
+    )
+    for date, rows in zip(dates, results):
+        for row in rows:
+            yield (date, int(row["value"]))
+            break
+
+
+def _release_metadata(ret: dict, release: str = None) -> dict:
+    """Override the FirstSeen and LastSeen metadata with the ones of the given
+    release, if any."""
+    if release and ret:
         try:
-            if release:
-                key = "oopses:%s" % release
-            else:
-                key = "oopses"
-            rows = Counters.objects.filter(key=key.encode(), column1=date).all()
-            for row in rows:
-                oopses = int(row.value)
-                yield (date, oopses)
-                break
-        except DoesNotExist:
+            ret["FirstSeen"] = ret["~%s:FirstSeen" % release]
+        except KeyError:
+            pass
+        try:
+            ret["LastSeen"] = ret["~%s:LastSeen" % release]
+        except KeyError:
             pass
+    return ret
 
 
 def get_metadata_for_bucket(bucketid: str, release: str = None):
@@ -373,25 +506,23 @@ def get_metadata_for_bucket(bucketid: str, release: str = None):
         ret = {}
         for row in rows:
             ret[row.column1] = row.value
-
-        if release and ret:
-            try:
-                ret["FirstSeen"] = ret["~%s:FirstSeen" % release]
-            except KeyError:
-                pass
-            try:
-                ret["LastSeen"] = ret["~%s:LastSeen" % release]
-            except KeyError:
-                pass
-        return ret
+        return _release_metadata(ret, release)
     except DoesNotExist:
         return {}
 
 
 def get_metadata_for_buckets(bucketids, release=None):
+    bucketids = list(bucketids)
+    if not release:
+        # Get all columns up to "~" (non-inclusive)
+        query = "SELECT column1, value FROM {keyspace}.\"BucketMetadata\" WHERE key = ? AND column1 < '~'"
+    else:
+        query = 'SELECT column1, value FROM {keyspace}."BucketMetadata" WHERE key = ?'
+    results = cassandra.execute_concurrent(query, [(bucketid.encode(),) for bucketid in bucketids])
     ret = dict()
-    for bucketid in bucketids:
-        ret[bucketid] = get_metadata_for_bucket(bucketid, release)
+    for bucketid, rows in zip(bucketids, results):
+        metadata = {row["column1"]: row["value"] for row in rows}
+        ret[bucketid] = _release_metadata(metadata, release)
     return ret
 
 
@@ -447,6 +578,39 @@ def get_average_crashes(field, release, days=7):
     return return_data
 
 
+def get_precomputed_average_crashes(fields, days=7):
+    """The get_average_crashes() series for each of the given fields, as
+    materialised by tools/average_crashes_update.py, read in a single query.
+
+    Fields for which the last `days` days were not materialised are missing
+    from the returned dictionary, as well as all of them if the materialised
+    series cannot be read."""
+    dates = _get_range_of_dates(0, days)
+    start = dates[-1]
+    end = dates[0]
+
+    try:
+        materialised = Indexes.objects.filter(
+            key=AVERAGE_CRASHES_DAYS, column1__in=list(fields)
+        ).all()
+        fields = [row.column1 for row in materialised if int(row.value) >= days]
+        if not fields:
+            return {}
+        rows = (
+            AverageCrashes.objects.filter(key__in=fields, column1__gte=start, column1__lte=end)
+            .limit(None)
+            .all()
+        )
+        results = {}
+        for row in rows:
+            t = int(time.mktime(time.strptime(row.column1, "%Y%m%d")))
+            results.setdefault(row.key, []).append((t, row.value))
+    except InvalidRequest:
+        config.logger.exception("Unable to read the materialised average crashes")
+        return {}
+    return results
+
+
 def get_average_instances(bucketid, release, days=7):
     # FIXME Why oh why did we do things this way around? It makes it impossible
     # to do a quick range scan. We should create DayBucketsCount2, replacing
@@ -518,6 +682,44 @@ def get_retrace_failure_for_bucket(bucketid: str):
         return {}
 
 
+def _release_or_devel(release):
+    if release:
+        return release
+    return "Ubuntu %s" % utils.get_devel_series(result="release").replace(" LTS", "")
+
+
+def is_source_package(package):
+    """Whether `package` is a source package of the development release,
+    according to tools/import_source_packages.py."""
+    release = _release_or_devel(None)
+    rows = SourceBinaryPackages.objects.filter(key=package, column1=release).limit(1)
+    return len(rows) > 0
+
+
+def get_binaries_in_source_package(package, release=None):
+    """The binary packages built from the source `package` in `release`, or
+    the development release, according to tools/import_source_packages.py."""
+    return get_binaries_in_source_packages([package], release)
+
+
+def get_binaries_in_source_packages(packages, release=None):
+    """The binary packages built from any of the source `packages`."""
+    results = cassandra.execute_concurrent(
+        'SELECT column2 FROM {keyspace}."SourceBinaryPackages" WHERE key = ? AND column1 = ?',
+        [(package, _release_or_devel(release)) for package in packages],
+    )
+    return sorted({row["column2"] for rows in results for row in rows})
+
+
+def get_packages_in_packageset(release, packageset):
+    """The source packages of a packageset in `release`, or the development
+    release, according to tools/import_source_packages.py."""
+    rows = PackagesetPackages.objects.filter(
+        key=_release_or_devel(release), column1=packageset
+    ).limit(None)
+    return [row.column2 for row in rows]
+
+
 def get_binary_packages_for_user(user):
     # query DayBucketsCount to ensure the package has crashes reported about
     # it rather than returning packages for which there will be no data.
@@ -535,16 +737,17 @@ def get_binary_packages_for_user(user):
     if len(binary_packages) == 0:
         return None
 
-    results = []
+    parameters = []
     for pkg in binary_packages:
-        count = (
-            DayBucketsCount.objects.filter(key=(pkg + ":%s" % last_month).encode())
-            .limit(1)
-            .count()
-            + DayBucketsCount.objects.filter(key=(pkg + ":%s" % current_month).encode())
-            .limit(1)
-            .count()
-        )
+        parameters.append(((pkg + ":%s" % last_month).encode(),))
+        parameters.append(((pkg + ":%s" % current_month).encode(),))
+    counts = cassandra.execute_concurrent(
+        'SELECT column1 FROM {keyspace}."DayBucketsCount" WHERE key = ? LIMIT 1', parameters
+    )
+
+    results = []
+    for i, pkg in enumerate(binary_packages):
+        count = len(counts[2 * i]) + len(counts[2 * i + 1])
         # only include packages that have recent crashes
         if count > 0:
             results.append(pkg)
@@ -552,155 +755,154 @@ def get_binary_packages_for_user(user):
     return results
 
 
+def _get_last_crash_counts(table: str, keys: list[str], date: str = None) -> list[dict]:
+    """The counts of the last 15 days with crashes for each of the given keys
+    of `table` (Counters or CountersForProposed), up to `date` if given, most
+    recent first."""
+    if date:
+        query = (
+            'SELECT column1, value FROM {keyspace}."%s" WHERE key = ? AND column1 <= ? '
+            "ORDER BY column1 DESC LIMIT 15" % table
+        )
+        parameters = [(key.encode(), date) for key in keys]
+    else:
+        query = (
+            'SELECT column1, value FROM {keyspace}."%s" WHERE key = ? '
+            "ORDER BY column1 DESC LIMIT 15" % table
+        )
+        parameters = [(key.encode(),) for key in keys]
+    results = cassandra.execute_concurrent(query, parameters)
+    return [{row["column1"]: row["value"] for row in rows} for rows in results]
+
+
 def get_package_crash_rate(
     release, src_package, old_version, new_version, pup, date, absolute_uri, exclude_proposed=False
 ):
     """Find the rate of Crashes, not other problems, about a package."""
-
+    return get_package_crash_rates(
+        [(release, src_package, old_version, new_version, pup)],
+        date,
+        absolute_uri,
+        exclude_proposed,
+    )[0]
+
+
+def get_package_crash_rates(packages, date, absolute_uri, exclude_proposed=False):
+    """Like get_package_crash_rate(), for a list of (release, src_package,
+    old_version, new_version, pup) tuples. The Counters are read
+    concurrently, and the increases are computed all at once."""
+    packages = list(packages)
     # the generic counter only includes Crashes for packages from official
     # Ubuntu sources and from systems not under auto testing
-    old_vers_column = "oopses:Crash:%s:%s:%s" % (release, src_package, old_version)
-    new_vers_column = "oopses:Crash:%s:%s:%s" % (release, src_package, new_version)
-    results = {}
-
-    try:
-        old_rows = (
-            Counters.objects.filter(key=old_vers_column.encode(), column1__lte=date)
-            .order_by("-column1")
-            .limit(15)
-            .all()
-        )
-        old_vers_data = {row.column1: row.value for row in old_rows}
-    except DoesNotExist:
-        old_vers_data = None
-
-    try:
-        # this may be unnecessarily long since updates phase in ~3 days
-        new_rows = (
-            Counters.objects.filter(key=new_vers_column.encode())
-            .order_by("-column1")
-            .limit(15)
-            .all()
-        )
-        new_vers_data = {row.column1: row.value for row in new_rows}
-    except DoesNotExist:
-        results["increase"] = False
-        return results
-
-    if not new_vers_data:
-        results["increase"] = False
-        return results
-
+    old_vers_columns = [
+        "oopses:Crash:%s:%s:%s" % (release, src_package, old_version)
+        for release, src_package, old_version, _, _ in packages
+    ]
+    new_vers_columns = [
+        "oopses:Crash:%s:%s:%s" % (release, src_package, new_version)
+        for release, src_package, _, new_version, _ in packages
+    ]
+    old_vers_data = _get_last_crash_counts("Counters", old_vers_columns, date)
+    # this may be unnecessarily long since updates phase in ~3 days
+    new_vers_data = _get_last_crash_counts("Counters", new_vers_columns)
     if exclude_proposed:
-        try:
-            proposed_old_rows = (
-                CountersForProposed.objects.filter(key=old_vers_column.encode(), column1__lte=date)
-                .order_by("-column1")
-                .limit(15)
-                .all()
-            )
-            proposed_old_vers_data = {row.column1: row.value for row in proposed_old_rows}
-        except DoesNotExist:
-            proposed_old_vers_data = None
-        try:
-            proposed_new_rows = (
-                CountersForProposed.objects.filter(key=new_vers_column.encode())
-                .order_by("-column1")
-                .limit(15)
-                .all()
-            )
-            proposed_new_vers_data = {row.column1: row.value for row in proposed_new_rows}
-        except DoesNotExist:
-            proposed_new_vers_data = None
+        proposed_old_vers_data = _get_last_crash_counts(
+            "CountersForProposed", old_vers_columns, date
+        )
+        proposed_new_vers_data = _get_last_crash_counts("CountersForProposed", new_vers_columns)
+    else:
+        proposed_old_vers_data = proposed_new_vers_data = [{}] * len(packages)
 
     today = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d")
-    try:
-        today_crashes = new_vers_data[today]
-    except KeyError:
-        # no crashes today so not an increase
-        results["increase"] = False
-        return results
+    all_results = []
+    # The packages that need their previous crashes looked at, with the index
+    # of their results, their crashes of today and their previous crashes.
+    candidates = []
+    for i, (release, src_package, _, new_version, pup) in enumerate(packages):
+        results = {}
+        all_results.append(results)
+        old_data = old_vers_data[i]
+        new_data = new_vers_data[i]
+        proposed_old_data = proposed_old_vers_data[i]
+        proposed_new_data = proposed_new_vers_data[i]
 
-    # subtract CountersForProposed data from today crashes
-    if exclude_proposed and proposed_new_vers_data:
         try:
-            today_proposed_crashes = proposed_new_vers_data[today]
+            today_crashes = new_data[today]
         except KeyError:
-            today_proposed_crashes = 0
-        today_crashes = today_crashes - today_proposed_crashes
-        if today_crashes == 0:
             # no crashes today so not an increase
             results["increase"] = False
-            return results
+            continue
+
+        # subtract CountersForProposed data from today crashes
+        if proposed_new_data:
+            today_crashes = today_crashes - proposed_new_data.get(today, 0)
+            if today_crashes == 0:
+                # no crashes today so not an increase
+                results["increase"] = False
+                continue
 
-    if new_vers_data and not old_vers_data:
-        results["increase"] = True
-        results["previous_average"] = None
-        # no previous version data so the diff is today's amount
-        results["difference"] = today_crashes
         web_link = "?release=%s&package=%s&version=%s" % (
             urllib.parse.quote(release),
             urllib.parse.quote(src_package),
             urllib.parse.quote(new_version),
         )
-        results["web_link"] = absolute_uri + web_link
-        return results
+        if not old_data:
+            results["increase"] = True
+            results["previous_average"] = None
+            # no previous version data so the diff is today's amount
+            results["difference"] = today_crashes
+            results["web_link"] = absolute_uri + web_link
+            continue
 
-    first_date = date
-    oldest_date = list(old_vers_data.keys())[-1]
-    dates = [x for x in _date_range_iterator(oldest_date, first_date)]
-    previous_vers_crashes = []
-    previous_days = len(dates[:-1])
-    for day in dates[:-1]:
-        # subtract CountersForProposed data from previous_vers_crashes
-        if exclude_proposed and proposed_old_vers_data:
-            try:
-                date_proposed_crashes = proposed_old_vers_data[day]
-            # the day doesn't exist so there were 0 errors
-            except KeyError:
-                date_proposed_crashes = 0
-        else:
-            date_proposed_crashes = 0
-        try:
-            previous_vers_crashes.append(old_vers_data[day] - date_proposed_crashes)
-        # the day doesn't exist so there were 0 errors
-        except KeyError:
-            previous_vers_crashes.append(0)
+        oldest_date = list(old_data.keys())[-1]
+        dates = [x for x in _date_range_iterator(oldest_date, date)]
+        # subtract CountersForProposed data from previous_vers_crashes, a day
+        # that doesn't exist had 0 errors
+        previous_vers_crashes = [
+            old_data.get(day, 0) - proposed_old_data.get(day, 0) for day in dates[:-1]
+        ]
 
-    results["increase"] = False
-    # 2 crashes may be a fluke
-    if today_crashes < 3:
-        return results
+        results["increase"] = False
+        # 2 crashes may be a fluke
+        if today_crashes < 3 or not previous_vers_crashes:
+            continue
+        # if an update isn't fully phased then the previous package version will
+        # generally have more crashes than the phasing one so multiple the quanity
+        # of crashes by the phasing percentage
+        pup = int(pup) if pup else 100
+        candidates.append((results, today_crashes, previous_vers_crashes, pup, web_link))
+
+    if not candidates:
+        return all_results
+
+    # The previous crashes of each candidate, one per row, padded with NaN
+    previous = numpy.full((len(candidates), max(len(c[2]) for c in candidates)), numpy.nan)
+    for row, (_, _, previous_vers_crashes, _, _) in enumerate(candidates):
+        previous[row, : len(previous_vers_crashes)] = previous_vers_crashes
+    today_crashes = numpy.array([c[1] for c in candidates], dtype=float)
+    pups = numpy.array([c[3] for c in candidates], dtype=float)
 
     now = datetime.datetime.now(datetime.timezone.utc)
     hour = float(now.hour)
     minute = float(now.minute)
-    mean_crashes = numpy.average(previous_vers_crashes)
-    standard_crashes = (mean_crashes + numpy.std(previous_vers_crashes)).round()
-    # if an update isn't fully phased then the previous package version will
-    # generally have more crashes than the phasing one so multiple the quanity
-    # of crashes by the phasing percentage
-    if pup:
-        standard_crashes = (standard_crashes * int(pup)) / 100
+    mean_crashes = numpy.nanmean(previous, axis=1)
+    standard_crashes = (mean_crashes + numpy.nanstd(previous, axis=1)).round()
+    standard_crashes = (standard_crashes * pups) / 100
     # FIXME: Given that release week will see these increase wildly, I wonder
     # if it would be suitable to divide by the number of unique systems that
     # report errors for this package and release combination. Don't we already
     # do this with the graph on the problem page?
     # multiply the standard amount of crashes by the portion of the day that
     # has passed
-    difference = today_crashes - (standard_crashes * ((hour * 60 + minute) / (24 * 60)))
-    if difference > 1:
-        results["increase"] = True
-        results["difference"] = difference
-        web_link = "?release=%s&package=%s&version=%s" % (
-            urllib.parse.quote(release),
-            urllib.parse.quote(src_package),
-            urllib.parse.quote(new_version),
-        )
-        results["web_link"] = absolute_uri + web_link
-        results["previous_period_in_days"] = previous_days
-        results["previous_average"] = standard_crashes
-    return results
+    differences = today_crashes - (standard_crashes * ((hour * 60 + minute) / (24 * 60)))
+    for row, (results, _, previous_vers_crashes, _, web_link) in enumerate(candidates):
+        if differences[row] > 1:
+            results["increase"] = True
+            results["difference"] = differences[row]
+            results["web_link"] = absolute_uri + web_link
+            results["previous_period_in_days"] = len(previous_vers_crashes)
+            results["previous_average"] = standard_crashes[row]
+    return all_results
 
 
 def get_package_new_buckets(src_pkg: str, previous_version: str, new_version: str):
@@ -720,17 +922,20 @@ def get_package_new_buckets(src_pkg: str, previous_version: str, new_version: st
     except (KeyError, DoesNotExist):
         p_data = []
 
-    new_buckets = set(n_data).difference(set(p_data))
-    for bucket in new_buckets:
-        # do not return buckets that failed to retrace
-        if bucket.startswith("failed:"):
-            continue
-
-        try:
-            count = BucketVersionSystems2.objects.filter(key=bucket, key2=new_version).count()
-        except DoesNotExist:
-            continue
-        if count <= 2:
+    # do not return buckets that failed to retrace
+    new_buckets = [
+        bucket
+        for bucket in set(n_data).difference(set(p_data))
+        if not bucket.startswith("failed:")
+    ]
+    # Only buckets with more than 2 systems are interesting, so there is no
+    # need to count the systems past 3.
+    systems = cassandra.execute_concurrent(
+        'SELECT column1 FROM {keyspace}."BucketVersionSystems2" WHERE key = ? AND key2 = ? LIMIT 3',
+        [(bucket, new_version) for bucket in new_buckets],
+    )
+    for bucket, rows in zip(new_buckets, systems):
+        if len(rows) <= 2:
             continue
         results.append(bucket)
     return results
@@ -743,6 +948,7 @@ def record_bug_for_bucket(bucketid: str, bug: int):
         return
     BucketMetadata.create(key=bucketid.encode(), column1="CreatedBug", value=str(bug))
     BugToCrashSignatures.create(key=bug, column1=bucketid, value=b"")
+    oopses.touch_bucket(bucketid)
 
 
 def get_signatures_for_bug(bug: int):
@@ -773,6 +979,23 @@ def get_problem_for_hash(hashed: str):
         return None
 
 
+def get_problems_for_hashes(hashes):
+    """Like get_problem_for_hash(), for many hashes at once, with one query per
+    Hashes partition. Hashes without a problem are left out."""
+    partitions = {}
+    for hashed in hashes:
+        partitions.setdefault(("bucket_%s" % hashed[0]).encode(), []).append(hashed.encode())
+    results = cassandra.execute_concurrent(
+        'SELECT column1, value FROM {keyspace}."Hashes" WHERE key = ? AND column1 IN ?',
+        list(partitions.items()),
+    )
+    ret = {}
+    for rows in results:
+        for row in rows:
+            ret[row["column1"].decode()] = row["value"]
+    return ret
+
+
 def get_system_image_versions(image_type: str):
     try:
         rows = SystemImages.objects.filter(key=image_type).limit(None).all()
@@ -786,17 +1009,20 @@ def get_queue_lengths(hours: int = 48):
     now = datetime.datetime.now(datetime.timezone.utc)
     cutoff = now - datetime.timedelta(hours=hours)
     cutoff_str = cutoff.strftime("%Y%m%d%H%M")
-    try:
-        rows = Indexes.objects.filter(key=b"retrace_queue_length").all()
-        results = {}
+    days = [
+        (cutoff + datetime.timedelta(days=i)).strftime("%Y%m%d")
+        for i in range((now.date() - cutoff.date()).days + 1)
+    ]
+    days = cassandra.execute_concurrent(
+        'SELECT column1, column2, value FROM {keyspace}."RetraceQueueLengths" '
+        "WHERE key = ? AND column1 >= ?",
+        [(day, cutoff_str) for day in days],
+    )
+    results = {}
+    # The days, and the rows of each day, are in chronological order.
+    for rows in days:
         for row in rows:
-            queue, ts = row.column1.split(":", 1)
-            if ts >= cutoff_str:
-                if queue not in results:
-                    results[queue] = []
-                results[queue].append({"timestamp": ts, "value": int(row.value)})
-        for queue in results:
-            results[queue].sort(key=lambda x: x["timestamp"])
-        return results
-    except DoesNotExist:
-        return {}
+            results.setdefault(row["column2"], []).append(
+                {"timestamp": row["column1"], "value": row["value"]}
+            )
+    return results
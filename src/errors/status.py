@@ -15,7 +15,7 @@ c = Client()
 
 def check_average_crashes():
     response = c.get("/api/1.0/average-crashes/?format=json")
-    data = loads(response.content)
+    data = loads(response.getvalue())
     old_ltses = [v for v in utils.get_unsupported_series(result="release") if "LTS" in v]
     prev_lts_version = old_ltses[-1].replace(" LTS", "") if len(old_ltses) else None
     releases = []
@@ -55,7 +55,7 @@ def check_buckets():
 def check_most_common_problems():
     url = "/api/1.0/most-common-problems/?limit=100&format=json"
     response = c.get(url)
-    data = loads(response.content)
+    data = loads(response.getvalue())
     if len(data["objects"]) == 100:
         obj = data["objects"][0]
         if "count" in obj and "function" in obj:
@@ -33,20 +33,16 @@ def bucket(request, bucketid=None, hashed=None):
     if not bucketid:
         return HttpResponseRedirect("/")
 
-    if not cassie.bucket_exists(bucketid):
+    summary = cassie.get_bucket_summary(bucketid)
+    if summary is None:
         return HttpResponseRedirect("/?problem-not-found=" + quote(bucketid))
 
-    traceback = cassie.get_traceback_for_bucket(bucketid)
-    metadata = cassie.get_metadata_for_bucket(bucketid)
-    failuredata = cassie.get_retrace_failure_for_bucket(bucketid)
-
-    if not traceback:
-        (stacktrace, thread_stacktrace) = cassie.get_stacktrace_for_bucket(bucketid)
-    else:
-        stacktrace = None
-        thread_stacktrace = None
-
-    source_package = cassie.get_source_package_for_bucket(bucketid)
+    traceback = summary["traceback"]
+    metadata = summary["metadata"]
+    failuredata = summary["retrace_failure"]
+    stacktrace = summary["stacktrace"]
+    thread_stacktrace = summary["thread_stacktrace"]
+    source_package = summary["source_package"]
     report = metadata.get("CreatedBug", "") or metadata.get("LaunchpadBug", "")
 
     if source_package == "":
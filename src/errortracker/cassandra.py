@@ -3,6 +3,7 @@ import os
 
 from cassandra.auth import PlainTextAuthProvider
 from cassandra.cluster import ConsistencyLevel
+from cassandra.concurrent import execute_concurrent_with_args
 from cassandra.cqlengine import connection, management
 from cassandra.policies import RoundRobinPolicy
 
@@ -13,6 +14,9 @@ _connected = False
 _session = None
 KEYSPACE: str = config.cassandra_creds["keyspace"]
 REPLICATION_FACTOR: int = 3
+# The maximum number of requests execute_concurrent() keeps in flight.
+CONCURRENCY: int = 32
+_prepared_statements = {}
 
 
 def setup_cassandra():
@@ -61,21 +65,56 @@ def sync_schema():
     os.environ["CQLENG_ALLOW_SCHEMA_MANAGEMENT"] = "1"
     management.create_keyspace_simple(name=KEYSPACE, replication_factor=REPLICATION_FACTOR)
 
-    def _find_subclasses(module, clazz):
-        return [
-            cls
-            for name, cls in inspect.getmembers(module)
-            if inspect.isclass(cls) and issubclass(cls, clazz) and cls is not clazz
-        ]
-
-    for klass in _find_subclasses(
-        errortracker.cassandra_schema, errortracker.cassandra_schema.ErrorTrackerTable
-    ):
+    for klass in _get_tables():
         management.sync_table(klass)
 
 
+def create_missing_tables():
+    """Create the tables of the schema which are not in the keyspace yet,
+    leaving the existing ones alone. sync_schema() only creates them along
+    with the keyspace."""
+    results = connection.get_session().execute(
+        "SELECT table_name FROM system_schema.tables WHERE keyspace_name=%s", [KEYSPACE]
+    )
+    existing = {row["table_name"] for row in results}
+    os.environ["CQLENG_ALLOW_SCHEMA_MANAGEMENT"] = "1"
+    for klass in _get_tables():
+        if klass.__table_name__ not in existing:
+            config.logger.info("Creating the %s table", klass.__table_name__)
+            management.sync_table(klass)
+
+
+def _get_tables():
+    return [
+        cls
+        for name, cls in inspect.getmembers(errortracker.cassandra_schema)
+        if inspect.isclass(cls)
+        and issubclass(cls, errortracker.cassandra_schema.ErrorTrackerTable)
+        and cls is not errortracker.cassandra_schema.ErrorTrackerTable
+    ]
+
+
 def cassandra_session():
     global _session
     if not _session:
         _session = connection.get_session()
     return _session
+
+
+def execute_concurrent(query: str, parameters, concurrency: int = CONCURRENCY) -> list[list]:
+    """Run the same query once for each set of parameters, keeping at most
+    `concurrency` requests in flight, so that the latency is the one of the
+    slowest query rather than the sum of all of them.
+
+    `query` uses `?` placeholders and `{keyspace}` for the current keyspace.
+    The rows of each query are returned in the same order as `parameters`."""
+    session = cassandra_session()
+    query = query.format(keyspace=session.keyspace)
+    statement = _prepared_statements.get(query)
+    if statement is None:
+        statement = session.prepare(query)
+        _prepared_statements[query] = statement
+    results = execute_concurrent_with_args(
+        session, statement, list(parameters), concurrency=concurrency
+    )
+    return [list(rows) for _, rows in results]
@@ -80,6 +80,17 @@ class DayUsers(ErrorTrackerTable):
     value = columns.Blob(db_field="value")
 
 
+class DayUsersSketch(ErrorTrackerTable):
+    __table_name__ = "DayUsersSketch"
+    # Ubuntu series ("Ubuntu 26.04", "Ubuntu 25.10", etc...)
+    key = columns.Text(db_field="key", primary_key=True)
+    # a datestamp ("20251101", "20240612", etc...)
+    column1 = columns.Text(db_field="column1", primary_key=True)
+    # a serialised errortracker.hyperloglog.HyperLogLog of the DayUsers of
+    # that release that day, as built by tools/unique_users_daily_update.py
+    value = columns.Blob(db_field="value")
+
+
 class UserOOPS(ErrorTrackerTable):
     __table_name__ = "UserOOPS"
     # the user ID, aka machine-id
@@ -226,6 +237,16 @@ class BucketVersionSystems2(ErrorTrackerTable):
     value = columns.Blob(db_field="value")
 
 
+class BucketLastWrites(ErrorTrackerTable):
+    __table_name__ = "BucketLastWrites"
+    # the bucket ID, that is the crash signature
+    #   - /usr/bin/already-bucketed:11:func1:main
+    key = columns.Text(db_field="key", primary_key=True)
+    # when a crash was last added to the bucket, its retracing failed or its
+    # metadata changed, see oopses.touch_bucket()
+    value = columns.DateTime(db_field="value")
+
+
 class BucketRetraceFailureReason(ErrorTrackerTable):
     __table_name__ = "BucketRetraceFailureReason"
     key = columns.Blob(db_field="key", primary_key=True)
@@ -307,6 +328,91 @@ class UniqueUsers90Days(ErrorTrackerTable):
     value = columns.BigInt(db_field="value")
 
 
+class AverageCrashes(ErrorTrackerTable):
+    __table_name__ = "AverageCrashes"
+    # the Counters field the average is computed for
+    #   - Ubuntu 24.04
+    #   - RecoverableProblem:Ubuntu 24.04
+    key = columns.Text(db_field="key", primary_key=True)
+    # a datestamp ("20251101", "20240612", etc...)
+    column1 = columns.Text(db_field="column1", primary_key=True)
+    # the number of crashes for that field that day, divided by the number of
+    # unique users of the release, as maintained by tools/average_crashes_update.py
+    value = columns.Double(db_field="value")
+
+
+class RetracingTime(ErrorTrackerTable):
+    __table_name__ = "RetracingTime"
+    # the release and architecture of the retracer
+    #   - Ubuntu 24.04:amd64
+    #   - Ubuntu 25.10:arm64
+    key = columns.Text(db_field="key", primary_key=True)
+    # a datestamp ("20251101", "20240612", etc...), so that a range of days
+    # is a slice of the partition
+    column1 = columns.Text(db_field="column1", primary_key=True)
+    # the mean time spent retracing a crash, in seconds
+    value = columns.Double(db_field="value")
+    # the number of retraced crashes the mean is computed on
+    count = columns.BigInt(db_field="count")
+
+
+class RetraceQueueLengths(ErrorTrackerTable):
+    __table_name__ = "RetraceQueueLengths"
+    # a datestamp ("20251101", "20240612", etc...)
+    key = columns.Text(db_field="key", primary_key=True)
+    # when the length was recorded ("202511011230")
+    column1 = columns.Text(db_field="column1", primary_key=True)
+    # the AMQP queue
+    #   - retrace_amd64
+    #   - retrace_high_amd64
+    #   - failed_retrace_arm64
+    column2 = columns.Text(db_field="column2", primary_key=True)
+    # the number of messages in the queue, as recorded by
+    # tools/record_queue_lengths.py, with a TTL
+    value = columns.BigInt(db_field="value")
+
+
+class LaunchpadCache(ErrorTrackerTable):
+    __table_name__ = "LaunchpadCache"
+    # the cached function of errortracker/launchpad.py
+    #   - is_source_package
+    #   - _get_most_recent_binary_version
+    key = columns.Text(db_field="key", primary_key=True)
+    # the arguments of the call
+    #   - ('zsh',)
+    #   - ('zsh', 'Ubuntu 24.04')
+    column1 = columns.Text(db_field="column1", primary_key=True)
+    # the JSON encoded result of the call, written with a TTL
+    value = columns.Blob(db_field="value")
+
+
+class SourceBinaryPackages(ErrorTrackerTable):
+    __table_name__ = "SourceBinaryPackages"
+    # source package name
+    #   - util-linux
+    key = columns.Text(db_field="key", primary_key=True)
+    # release in which the source package is published
+    #   - Ubuntu 24.04
+    column1 = columns.Text(db_field="column1", primary_key=True)
+    # binary package built from the source package in that release
+    #   - fdisk
+    #   - util-linux
+    column2 = columns.Text(db_field="column2", primary_key=True)
+
+
+class PackagesetPackages(ErrorTrackerTable):
+    __table_name__ = "PackagesetPackages"
+    # release
+    #   - Ubuntu 24.04
+    key = columns.Text(db_field="key", primary_key=True)
+    # packageset name
+    #   - desktop-core
+    column1 = columns.Text(db_field="column1", primary_key=True)
+    # source package included in the packageset
+    #   - gnome-shell
+    column2 = columns.Text(db_field="column2", primary_key=True)
+
+
 class UserBinaryPackages(ErrorTrackerTable):
     __table_name__ = "UserBinaryPackages"
     # a team that usually owns packages (like for MIR)
@@ -57,6 +57,21 @@ errors_debug = True
 # Allow the Django app to fill bugs
 allow_bug_filing = True
 
+# Django cache backend used to store the responses of the API, see
+# errors/api/cache.py. Examples:
+# errors_api_cache = {
+#     "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+#     "LOCATION": "/var/tmp/errors_api_cache",
+# }
+# errors_api_cache = {
+#     "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+#     "LOCATION": "127.0.0.1:11211",
+# }
+errors_api_cache = {
+    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    "LOCATION": "errors-api",
+}
+
 # Some variable still used by the launchpad.py module
 lp_oauth_token = "todofixme"
 lp_oauth_secret = "todofixme"
@@ -0,0 +1,176 @@
+"""Decoding of the core files submitted by whoopsie.
+
+Cores are stored in Swift as whoopsie uploads them: the CoreDump field of the
+apport report, that is a gzip compressed core, base64 encoded in lines. They
+are decoded while being downloaded, straight to the core file, so that the
+data only goes to disk once. They are then checked to be complete ELF core
+files before being retraced.
+"""
+
+import binascii
+import hashlib
+import mmap
+import os
+import struct
+import zlib
+
+# The largest core accepted, once decompressed, in bytes
+MAX_CORE_SIZE = 32 * 1024**3
+# The largest block decompressed at once, in bytes, so that highly
+# compressible cores don't need much memory
+BLOCK_SIZE = 1024 * 1024
+
+ELF_MAGIC = b"\x7fELF"
+ET_CORE = 4
+PT_LOAD = 1
+PT_NOTE = 4
+# e_phnum value meaning that the number of program headers is in the sh_info
+# field of the first section header
+PN_XNUM = 0xFFFF
+# The formats of the ELF header fields after e_ident, of the program headers,
+# and of the first section header fields up to sh_info, per ELF class
+ELF_FORMATS = {
+    1: ("HHIIIIIHHHHHH", "IIIIIIII", "IIIIIIII"),
+    2: ("HHIQQQIHHHHHH", "IIQQQQQQ", "IIQQQQII"),
+}
+EI_NIDENT = 16
+
+
+class CoreError(Exception):
+    """The core cannot be decoded, there is no value in trying again."""
+
+
+class ChecksumError(Exception):
+    """The core that was downloaded is not the one that is stored."""
+
+
+def decode_base64_lines(chunks):
+    """Decode base64 data written in lines, each one encoded on its own, from
+    chunks split anywhere."""
+    line = bytearray()
+    for chunk in chunks:
+        *complete, rest = chunk.split(b"\n")
+        for part in complete:
+            line += part
+            if data := line.strip():
+                yield _b64decode(data)
+            line.clear()
+        line += rest
+    if data := line.strip():
+        yield _b64decode(data)
+
+
+def _b64decode(data):
+    try:
+        return binascii.a2b_base64(data, strict_mode=True)
+    except binascii.Error as e:
+        raise CoreError(f"Invalid base64: {e}") from e
+
+
+def decompress(blocks, max_size=MAX_CORE_SIZE):
+    """Decompress a gzip or zlib stream, checking its checksum and that it
+    isn't truncated nor bigger than `max_size`."""
+    # Detect the header automatically, the checksum is verified by zlib.
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 32)
+    size = 0
+    try:
+        for block in blocks:
+            while block and not decompressor.eof:
+                data = decompressor.decompress(block, BLOCK_SIZE)
+                block = decompressor.unconsumed_tail
+                size += len(data)
+                if size > max_size:
+                    raise CoreError(f"The core is bigger than {max_size} bytes")
+                yield data
+        data = decompressor.flush()
+    except zlib.error as e:
+        raise CoreError(f"Invalid compressed data: {e}") from e
+    if size + len(data) > max_size:
+        raise CoreError(f"The core is bigger than {max_size} bytes")
+    yield data
+    if not decompressor.eof:
+        raise CoreError("The core is truncated")
+
+
+def get_etag(headers):
+    """The ETag of a Swift object from its headers, if it is the MD5 checksum
+    of its content. It isn't for the static and dynamic large objects."""
+    if headers.get("x-static-large-object") or headers.get("x-object-manifest"):
+        return None
+    return headers.get("etag")
+
+
+def write_core(chunks, path, etag=None, max_size=MAX_CORE_SIZE) -> int:
+    """Decode the core from the chunks of its Swift object to `path`, and
+    return its size. When given the `etag` of the object, the MD5 checksum
+    of the chunks is checked against it."""
+    md5 = hashlib.md5(usedforsecurity=False)
+
+    def checksummed():
+        for chunk in chunks:
+            md5.update(chunk)
+            yield chunk
+
+    size = 0
+    with open(path, "wb") as fp:
+        for block in decompress(decode_base64_lines(checksummed()), max_size):
+            fp.write(block)
+            size += len(block)
+    if etag and md5.hexdigest() != etag.strip('"'):
+        raise ChecksumError(f"Expected a MD5 checksum of {etag}, got {md5.hexdigest()}")
+    return size
+
+
+def validate_core(path):
+    """Check that `path` is an ELF core file, which isn't truncated: all its
+    PT_LOAD and PT_NOTE segments have to be in the file. Only the headers
+    are read. CoreError is raised if it isn't valid."""
+    with open(path, "rb") as fp:
+        size = os.fstat(fp.fileno()).st_size
+        if size < EI_NIDENT:
+            raise CoreError("Not a core dump: the file is too small")
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            try:
+                _validate_core(data, size)
+            except struct.error as e:
+                raise CoreError(f"Not a core dump: invalid headers: {e}") from e
+
+
+def _validate_core(data, size):
+    if data[:4] != ELF_MAGIC:
+        raise CoreError("Not a core dump: not an ELF file")
+    elf_class, elf_data = data[4], data[5]
+    if elf_class not in ELF_FORMATS or elf_data not in (1, 2):
+        raise CoreError("Not a core dump: unknown ELF class or data encoding")
+    order = "<" if elf_data == 1 else ">"
+    header, program_header, section_header = (order + f for f in ELF_FORMATS[elf_class])
+    (e_type, _, _, _, e_phoff, e_shoff, _, _, e_phentsize, e_phnum, _, _, _) = struct.unpack_from(
+        header, data, EI_NIDENT
+    )
+    if e_type != ET_CORE:
+        raise CoreError(f"Not a core dump: the ELF type is {e_type}")
+    if e_phnum == PN_XNUM and e_shoff:
+        e_phnum = struct.unpack_from(section_header, data, e_shoff)[-1]
+    if e_phentsize < struct.calcsize(program_header):
+        raise CoreError(f"Not a core dump: invalid program header size {e_phentsize}")
+    if e_phoff + e_phnum * e_phentsize > size:
+        raise CoreError("Not a core dump: the program headers are truncated")
+
+    notes = 0
+    expected = 0
+    for i in range(e_phnum):
+        fields = struct.unpack_from(program_header, data, e_phoff + i * e_phentsize)
+        if elf_class == 1:
+            p_type, p_offset, _, _, p_filesz = fields[:5]
+        else:
+            p_type, _, p_offset, _, _, p_filesz = fields[:6]
+        if p_type in (PT_LOAD, PT_NOTE):
+            expected = max(expected, p_offset + p_filesz)
+        if p_type == PT_NOTE:
+            notes += 1
+    if not notes:
+        raise CoreError("Not a core dump: there is no PT_NOTE segment")
+    if expected > size:
+        raise CoreError(
+            f"The core is truncated: expected core file size >= {expected}, found: {size}"
+        )
@@ -0,0 +1,222 @@
+"""A cache of the packages downloaded by apport, shared by the retracers of a
+host.
+
+apport has apt download the packages needed to retrace a crash to the cache
+directory of the retracer, which is private to it and usually wiped after
+each retrace, so the same packages used to be downloaded again and again.
+They are now also kept in a store, under a size budget:
+
+    <root>/objects/<sha256>              the packages, addressed by content
+    <root>/index/<package>/<file name>   symlinks to them, by apt file name
+
+Before a retrace, the packages of the crash which are in the store are hard
+linked to the apt archives directory, where apt finds them instead of
+downloading them. After it, the packages apport downloaded are added to the
+store, and the least recently used ones are removed if it got too big.
+Retracers lock the store while they use it, so they can share it.
+
+In pool mode, the retracers also share their sandbox and cache directories,
+see acquire_shared_dir(). The sandboxes are kept between retraces, and wiped
+when they get too big, see trim_sandbox().
+"""
+
+import fcntl
+import hashlib
+import itertools
+import os
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+
+# Where apt downloads the packages of a release, in apport's cache directory
+ARCHIVES = Path("apt", "var", "cache", "apt", "archives")
+PACKAGE_SUFFIXES = (".deb", ".ddeb")
+# The packages installed along with a binary package for its debug symbols
+DEBUG_SUFFIXES = ("", "-dbgsym", "-dbg")
+
+
+def get_archives_dir(cache_dir, release) -> Path:
+    return Path(cache_dir) / release / ARCHIVES
+
+
+def get_needed_packages(report) -> list[tuple[str, str]]:
+    """The (name, version) of the packages apport installs to retrace a
+    report: its package and its dependencies."""
+    packages = []
+    lines = [report.get("Package", "")] + report.get("Dependencies", "").splitlines()
+    for line in lines:
+        # "libc6 2.39-0ubuntu8.4 [origin: Ubuntu]"
+        fields = line.split()
+        if len(fields) >= 2:
+            packages.append((fields[0], fields[1]))
+    return packages
+
+
+def acquire_shared_dir(sandbox_dir, release, architecture):
+    """Lock a sandbox and cache directory of the release, shared by the
+    retracers of the host, and return it along with its lock, which is
+    released when closed. A new one is created when they are all in use, so
+    there are as many of them as retraces of that release ran at the same
+    time."""
+    for i in itertools.count():
+        shared = Path(sandbox_dir) / release / f"shared-{architecture}-{i}"
+        shared.mkdir(parents=True, exist_ok=True)
+        lock = open(shared / "pid", "a+")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            continue
+        # Record who is using it, like for the private directories of the
+        # retracers.
+        lock.truncate(0)
+        lock.write("%d" % os.getpid())
+        lock.flush()
+        return shared, lock
+
+
+def get_size(path) -> int:
+    """The size of the files under `path`, in bytes."""
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.lstat(os.path.join(root, name)).st_size
+            except FileNotFoundError:
+                pass
+    return size
+
+
+def trim_sandbox(sandbox, max_size: int) -> bool:
+    """Wipe a sandbox if it is bigger than `max_size` bytes, and return
+    whether it was. The packages of every version of every package unpacked
+    to it accumulate there otherwise. A shared sandbox has to be locked."""
+    if get_size(sandbox) <= max_size:
+        return False
+    shutil.rmtree(sandbox)
+    os.mkdir(sandbox)
+    return True
+
+
+def _sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        while block := fp.read(1024 * 1024):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DebCache:
+    def __init__(self, root, max_size: int):
+        self.root = Path(root)
+        self.max_size = max_size
+        self.objects = self.root / "objects"
+        self.index = self.root / "index"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.index.mkdir(exist_ok=True)
+
+    @contextmanager
+    def lock(self, operation):
+        with open(self.root / "lock", "a") as fp:
+            fcntl.flock(fp, operation)
+            yield
+
+    def link(self, packages, archives_dir) -> int:
+        """Hard link the files of `packages`, (name, version) tuples, which
+        are in the store to `archives_dir`, and return how many there were."""
+        archives_dir = Path(archives_dir)
+        archives_dir.mkdir(parents=True, exist_ok=True)
+        hits = 0
+        with self.lock(fcntl.LOCK_SH):
+            for name, version in packages:
+                for entry in self._find(name, version):
+                    if self._link(entry, archives_dir):
+                        hits += 1
+        return hits
+
+    def contains(self, name, version, suffixes=DEBUG_SUFFIXES) -> bool:
+        """Whether the store has files of that version of the package, or of
+        the packages of its debug symbols with the given suffixes."""
+        return any(os.path.exists(entry.path) for entry in self._find(name, version, suffixes))
+
+    def _find(self, name, version, suffixes=DEBUG_SUFFIXES):
+        """The index entries of the files of that version of the package and
+        of its debug symbols."""
+        for suffix in suffixes:
+            # apt quotes the epoch separator in the file names.
+            prefix = "%s%s_%s_" % (name, suffix, version.replace(":", "%3a"))
+            directory = self.index / (name + suffix)
+            if not directory.is_dir():
+                continue
+            with os.scandir(directory) as entries:
+                yield from [entry for entry in entries if entry.name.startswith(prefix)]
+
+    def _link(self, entry, archives_dir) -> bool:
+        # link() doesn't follow symlinks on Linux.
+        obj = os.path.realpath(entry.path)
+        try:
+            os.link(obj, archives_dir / entry.name)
+        except FileExistsError:
+            pass
+        except FileNotFoundError:
+            # The package was removed from the store.
+            Path(entry.path).unlink(missing_ok=True)
+            return False
+        # Keep track of the last use, for the eviction.
+        os.utime(obj)
+        return True
+
+    def add(self, cache_dir) -> tuple[int, int]:
+        """Add the packages downloaded to `cache_dir` to the store, remove the
+        least recently used ones if it is now bigger than `max_size`, and
+        return how many packages were added and their size."""
+        added = size = 0
+        with self.lock(fcntl.LOCK_EX):
+            for path in Path(cache_dir).rglob("*"):
+                if path.suffix not in PACKAGE_SUFFIXES or "partial" in path.parts:
+                    continue
+                stat = path.lstat()
+                # Packages linked from the store have several links.
+                if not path.is_file() or path.is_symlink() or stat.st_nlink > 1:
+                    continue
+                self._add(path)
+                added += 1
+                size += stat.st_size
+            self.evict()
+        return added, size
+
+    def _add(self, path):
+        obj = self.objects / _sha256(path)
+        if not obj.exists():
+            try:
+                os.link(path, obj)
+            except OSError:
+                # Not on the same filesystem
+                tmp = obj.with_suffix(".tmp")
+                shutil.copyfile(path, tmp)
+                tmp.rename(obj)
+        # apt sets the time of the packages it downloads to the one of the
+        # server, the time they were added is the one of their last use.
+        os.utime(obj)
+        entry = self.index / path.name.split("_", 1)[0] / path.name
+        entry.parent.mkdir(exist_ok=True)
+        entry.unlink(missing_ok=True)
+        entry.symlink_to(Path("..", "..", "objects", obj.name))
+
+    def evict(self) -> int:
+        """Remove the least recently used packages until the store fits in
+        `max_size`, and return its size. The store has to be locked."""
+        objects = []
+        total = 0
+        with os.scandir(self.objects) as entries:
+            for entry in entries:
+                stat = entry.stat()
+                objects.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        for _, size, path in sorted(objects):
+            if total <= self.max_size:
+                break
+            # Their index entries are removed when they are next looked up.
+            os.unlink(path)
+            total -= size
+        return total
@@ -0,0 +1,68 @@
+"""A HyperLogLog sketch, to estimate the number of distinct items of a set
+without keeping them all in memory.
+
+See "HyperLogLog: the analysis of a near-optimal cardinality estimation
+algorithm", Flajolet et al., 2007, and "HyperLogLog in Practice", Heule et
+al., 2013, for the small range correction.
+"""
+
+import math
+from hashlib import blake2b
+
+# 2^14 registers of one byte each: 16 KiB per sketch, for a standard error of
+# 1.04 / sqrt(2^14), about 0.8%.
+PRECISION = 14
+
+
+class HyperLogLog:
+    def __init__(self, precision: int = PRECISION, registers: bytes = None):
+        self.precision = precision
+        self.size = 1 << precision
+        if registers is None:
+            self.registers = bytearray(self.size)
+        else:
+            if len(registers) != self.size:
+                raise ValueError(
+                    f"Expected {self.size} registers for a precision of {precision}, "
+                    f"got {len(registers)}"
+                )
+            self.registers = bytearray(registers)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        """Load a sketch serialised with to_bytes()."""
+        return cls(precision=data[0], registers=data[1:])
+
+    def to_bytes(self) -> bytes:
+        return bytes([self.precision]) + bytes(self.registers)
+
+    def add(self, item: str | bytes):
+        if isinstance(item, str):
+            item = item.encode()
+        x = int.from_bytes(blake2b(item, digest_size=8).digest(), "big")
+        index = x >> (64 - self.precision)
+        # The position of the leftmost 1 bit in the remaining bits.
+        rank = (64 - self.precision) - (x & ((1 << (64 - self.precision)) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, items):
+        for item in items:
+            self.add(item)
+
+    def merge(self, other: "HyperLogLog"):
+        """Add all the items of `other` to this sketch."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches of different precisions")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        """The estimated number of distinct items added to the sketch."""
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0**-r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small range correction, linear counting is more accurate there.
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
@@ -1,5 +1,9 @@
+import json
 import sys
-from functools import cmp_to_key
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import cmp_to_key, wraps
 from urllib.parse import quote
 
 import apt
@@ -8,7 +12,7 @@ from launchpadlib.credentials import AccessToken, Credentials
 from launchpadlib.launchpad import Launchpad
 from lazr.restfulclient.errors import HTTPError
 
-from errortracker import config, utils
+from errortracker import cassandra_schema, config, utils
 
 if (
     not hasattr(config, "lp_oauth_token")
@@ -29,23 +33,33 @@ else:
 # previously generated by hand.
 _OAUTH_CONSUMER = "testing"
 
-# Lazily-instantiated, module-level launchpadlib handles. They are created on
-# first use rather than at import time to avoid making network requests when
-# the module is merely imported.
-_launchpad = None
-_ubuntu_distro = None
-_primary_archive_obj = None
+# How many Launchpad requests are made at the same time by the functions
+# working on many items at once.
+LP_CONCURRENCY = 8
+# How long the state of a bug is cached, in seconds
+BUG_STATE_TTL = 15 * 60
+# How long a bug which could not be fetched is cached, in seconds. It may be
+# private, or Launchpad may have had a hiccup.
+BUG_STATE_ERROR_TTL = 60
+
+# Lazily-instantiated launchpadlib handles. They are created on first use
+# rather than at import time to avoid making network requests when the module
+# is merely imported. launchpadlib is not thread-safe, so each thread gets its
+# own.
+_handles = threading.local()
+_executor = None
+_bug_states = utils.TTLCache(ttl=BUG_STATE_TTL, maxsize=10000)
+_bug_master_ids = utils.TTLCache(ttl=BUG_STATE_TTL, maxsize=10000)
 
 
 def _get_launchpad():
-    global _launchpad
-    if _launchpad is None:
+    if getattr(_handles, "launchpad", None) is None:
         access_token = AccessToken(key=config.lp_oauth_token, secret=config.lp_oauth_secret)
         credentials = Credentials(
             consumer_name=_OAUTH_CONSUMER,
             access_token=access_token,
         )
-        _launchpad = Launchpad(
+        _handles.launchpad = Launchpad(
             credentials,
             None,
             None,
@@ -53,94 +67,193 @@ def _get_launchpad():
             cache=config.http_cache_dir,
             version="devel",
         )
-    return _launchpad
+    return _handles.launchpad
 
 
 def _ubuntu():
-    global _ubuntu_distro
-    if _ubuntu_distro is None:
-        _ubuntu_distro = _get_launchpad().distributions["ubuntu"]
-    return _ubuntu_distro
+    if getattr(_handles, "ubuntu", None) is None:
+        _handles.ubuntu = _get_launchpad().distributions["ubuntu"]
+    return _handles.ubuntu
 
 
 def _primary_archive():
-    global _primary_archive_obj
-    if _primary_archive_obj is None:
-        _primary_archive_obj = _ubuntu().main_archive
-    return _primary_archive_obj
+    if getattr(_handles, "primary_archive", None) is None:
+        _handles.primary_archive = _ubuntu().main_archive
+    return _handles.primary_archive
+
+
+# How long empty results (unknown packages, versions not published yet,
+# etc...) are cached, in seconds
+NEGATIVE_TTL = 10 * 60
+# How long results are kept in the memory of each process before being read
+# again from the shared cache, in seconds, and how many of them.
+LOCAL_TTL = 5 * 60
+LOCAL_CACHE_SIZE = 4096
+
+_MISSING = object()
+
+
+def _cached(ttl):
+    """Cache the results of an archive query for `ttl` seconds, or
+    NEGATIVE_TTL for empty ones. `ttl` may also be a function returning the
+    TTL of a given result.
+
+    The results are shared between all the processes and hosts through the
+    LaunchpadCache table, where they expire with a Cassandra TTL, so they
+    have to be JSON serialisable. The most recently used ones are also kept
+    in memory for a little while, serialised too so that callers get their
+    own copy. Failing to use the shared cache doesn't prevent asking
+    Launchpad."""
+
+    def decorator(func):
+        name = func.__name__
+        local = utils.TTLCache(ttl=LOCAL_TTL, maxsize=LOCAL_CACHE_SIZE)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = repr(args + tuple(sorted(kwargs.items())))
+            data = local.get(key, _MISSING)
+            if data is not _MISSING:
+                return json.loads(data)
+
+            try:
+                row = cassandra_schema.LaunchpadCache.objects.filter(key=name, column1=key).first()
+                value = json.loads(row.value) if row is not None else _MISSING
+            except ValueError:
+                # Written by another version of the code
+                value = _MISSING
+            except Exception:
+                config.logger.exception("Unable to read the Launchpad cache")
+                value = _MISSING
+            if value is not _MISSING:
+                data = json.dumps(value)
+            else:
+                value = func(*args, **kwargs)
+                data = json.dumps(value)
+                if not value:
+                    value_ttl = NEGATIVE_TTL
+                elif callable(ttl):
+                    value_ttl = ttl(value)
+                else:
+                    value_ttl = ttl
+                try:
+                    cassandra_schema.LaunchpadCache.ttl(value_ttl).create(
+                        key=name, column1=key, value=data.encode()
+                    )
+                except Exception:
+                    config.logger.exception("Unable to write the Launchpad cache")
+            local.set(key, data, LOCAL_TTL if value else min(LOCAL_TTL, NEGATIVE_TTL))
+            return json.loads(data)
+
+        wrapper.local_cache = local
+        return wrapper
+
+    return decorator
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=LP_CONCURRENCY)
+    return _executor
+
+
+# Ubuntu series, codename -> version. They come from distro-info-data, so
+# that resolving them doesn't need any request to Launchpad, which is only
+# asked about the series distro-info-data doesn't know about (yet), at most
+# once every NEGATIVE_TTL.
+_series_versions = {}
+_series_lock = threading.Lock()
+_series_refreshed = 0.0
+# The i386 DistroArchSeries link of each codename
+_das_links = {}
+
+
+def _get_series_versions():
+    if not _series_versions:
+        with _series_lock:
+            if not _series_versions:
+                _series_versions.update(
+                    (release.series, release.version.removesuffix(" LTS"))
+                    for release in utils.UDI.get_all(result="object")
+                )
+    return _series_versions
+
+
+def _refresh_series_versions():
+    """Add the series only known by Launchpad. Returns whether it was asked."""
+    global _series_refreshed
+    with _series_lock:
+        if time.time() - _series_refreshed < NEGATIVE_TTL:
+            return False
+        _series_refreshed = time.time()
+    series_versions = _get_series_versions()
+    for series in _ubuntu().series:
+        series_versions.setdefault(series.name, series.version)
+    return True
 
 
-def _get_series(codename):
-    """Return the distro series for a codename, or None if it does not exist."""
+def _get_series_link(codename):
+    """Return the API link of the distro series for a codename, or None if it
+    does not exist. Links can be passed to the API in place of the objects."""
     if not codename:
         return None
-    try:
-        return _ubuntu().getSeries(name_or_version=codename)
-    except (KeyError, HTTPError):
+    if codename not in _get_series_versions() and not (
+        _refresh_series_versions() and codename in _series_versions
+    ):
         return None
+    return "%sdevel/ubuntu/%s" % (_service_root, quote(codename))
 
 
-def _get_i386_distro_arch_series(codename):
-    """Return the i386 DistroArchSeries for a codename, or None."""
-    series = _get_series(codename)
-    if series is None:
-        return None
-    try:
-        return series.getDistroArchSeries(archtag="i386")
-    except (KeyError, HTTPError):
+def _get_series(codename):
+    """Return the distro series for a codename, or None if it does not exist."""
+    link = _get_series_link(codename)
+    if link is None:
         return None
+    if getattr(_handles, "series", None) is None:
+        _handles.series = {}
+    if link not in _handles.series:
+        try:
+            _handles.series[link] = _get_launchpad().load(link)
+        except (KeyError, HTTPError):
+            return None
+    return _handles.series[link]
+
+
+def _get_i386_distro_arch_series(codename):
+    """Return the API link of the i386 DistroArchSeries for a codename, or
+    None."""
+    if codename not in _das_links:
+        series = _get_series_link(codename)
+        if series is None:
+            return None
+        _das_links[codename] = series + "/i386"
+    return _das_links[codename]
 
 
 # Bug and package lookup.
 
 
 def get_all_codenames():
-    return [series.name for series in _ubuntu().series]
+    return list(_get_series_versions())
 
 
 def get_codename_for_version(version):
-    release_codenames = {
-        "12.04": "precise",
-        "12.10": "quantal",
-        "13.04": "raring",
-        "13.10": "saucy",
-        "14.04": "trusty",
-        "14.10": "utopic",
-        "15.04": "vivid",
-        "15.10": "wily",
-        "16.04": "xenial",
-        "16.10": "yakkety",
-        "17.04": "zesty",
-        "17.10": "artful",
-        "18.04": "bionic",
-        "18.10": "cosmic",
-        "19.04": "disco",
-        "19.10": "eoan",
-        "20.04": "focal",
-        "20.10": "groovy",
-        "21.04": "hirsute",
-        "21.10": "impish",
-        "22.04": "jammy",
-        "22.10": "kinetic",
-        "23.04": "lunar",
-        "23.10": "mantic",
-        "24.04": "noble",
-        "24.10": "oracular",
-    }
     if not version:
         return None
-    if version in list(release_codenames.values()):
+    series_versions = _get_series_versions()
+    if version in series_versions:
         return version
     elif version.startswith("Ubuntu "):
         version = version.replace("Ubuntu ", "")
-    if version in release_codenames:
-        return release_codenames[version]
-    elif version == "Ubuntu RTM 14.09":
+    if version == "Ubuntu RTM 14.09":
         return "14.09"
-    else:
-        for series in _ubuntu().series:
-            if series.version == version:
-                return series.name
+    for _ in range(2):
+        for codename, series_version in list(series_versions.items()):
+            if series_version == version:
+                return codename
+        if not _refresh_series_versions():
+            break
     return None
 
 
@@ -149,12 +262,12 @@ def get_devel_series_codename():
 
 
 def get_version_for_codename(codename):
-    for series in _ubuntu().series:
-        if series.name == codename:
-            return series.version
+    if codename in _get_series_versions() or _refresh_series_versions():
+        return _series_versions.get(codename)
     return None
 
 
+@_cached(ttl=60 * 60)
 def get_versions_for_binary(binary_package, ubuntu_version):
     if not ubuntu_version:
         codename = get_devel_series_codename()
@@ -163,7 +276,7 @@ def get_versions_for_binary(binary_package, ubuntu_version):
     if not codename:
         return []
     if is_source_package(binary_package):
-        series = _get_series(codename)
+        series = _get_series_link(codename)
         if series is None:
             return ""
         sources = _ubuntu().main_archive.getPublishedSources(
@@ -246,6 +359,7 @@ def binaries_are_most_recent(specific_packages, release=None):
     return result
 
 
+@_cached(ttl=60 * 60)
 def _get_most_recent_binary_version(package, release):
     kwargs = {
         "binary_name": package,
@@ -254,8 +368,6 @@ def _get_most_recent_binary_version(package, release):
         "order_by_date": True,
     }
     if release:
-        # TODO cache this by pushing it into the above function and instead
-        # passing the distro_arch_series url.
         codename = get_codename_for_version(release.split()[1])
         das = _get_i386_distro_arch_series(codename)
         if das is not None:
@@ -292,6 +404,7 @@ def pocket_for_binaries(specific_packages):
     return result
 
 
+@_cached(ttl=60 * 60)
 def _get_pocket_for_binary_version(package, version, release):
     # the package version may be Superseded or Obsolete, so do not restrict by
     # status here.
@@ -301,8 +414,6 @@ def _get_pocket_for_binary_version(package, version, release):
         "exact_match": True,
         "order_by_date": True,
     }
-    # TODO cache this by pushing it into the above function and instead
-    # passing the distro_arch_series url.
     codename = get_codename_for_version(release.split()[-1])
     das = _get_i386_distro_arch_series(codename)
     if das is not None:
@@ -327,7 +438,17 @@ def binary_is_most_recent(package, version):
     return apt.apt_pkg.version_compare(version, latest_version) != -1
 
 
-def bug_is_fixed(bug, release=None):
+def _get_bug(bug):
+    """Return the bug and its bug tasks, or (None, []) if it cannot be seen."""
+    try:
+        bug_obj = _get_launchpad().bugs[int(bug)]
+        return bug_obj, list(bug_obj.bug_tasks)
+    except (ValueError, KeyError, HTTPError):
+        # We will presume that this is a private bug.
+        return None, []
+
+
+def _bug_tasks_are_fixed(entries, release=None):
     if release:
         release = release.split()[1]
     codename = get_codename_for_version(release)
@@ -336,13 +457,6 @@ def bug_is_fixed(bug, release=None):
     else:
         codename_task = ""
 
-    try:
-        bug_obj = _get_launchpad().bugs[int(bug)]
-        entries = list(bug_obj.bug_tasks)
-    except (ValueError, KeyError, HTTPError):
-        # We will presume that this is a private bug.
-        return None
-
     if len(entries) == 0:
         # We will presume that this is a private bug.
         return None
@@ -373,13 +487,8 @@ def bug_is_fixed(bug, release=None):
         return False
 
 
-def bug_get_master_id(bug):
-    """Return master bug (of which given bug is a duplicate)
-
-    Return None if bug is not a duplicate.
-    """
+def _bug_master_id(bug_obj):
     try:
-        bug_obj = _get_launchpad().bugs[int(bug)]
         master = bug_obj.duplicate_of
         if master:
             return str(master.id)
@@ -388,6 +497,57 @@ def bug_get_master_id(bug):
     return None
 
 
+def bug_is_fixed(bug, release=None):
+    _, entries = _get_bug(bug)
+    return _bug_tasks_are_fixed(entries, release)
+
+
+def bug_get_master_id(bug):
+    """Return master bug (of which given bug is a duplicate)
+
+    Return None if bug is not a duplicate.
+    """
+    master_id = _bug_master_ids.get(str(bug), _MISSING)
+    if master_id is not _MISSING:
+        return master_id
+    try:
+        bug_obj = _get_launchpad().bugs[int(bug)]
+    except (ValueError, KeyError, HTTPError):
+        return None
+    master_id = _bug_master_id(bug_obj)
+    _bug_master_ids.set(str(bug), master_id)
+    return master_id
+
+
+def _get_bug_state(bug, release):
+    bug_obj, entries = _get_bug(bug)
+    if bug_obj is None:
+        return (None, None)
+    return (_bug_tasks_are_fixed(entries, release), _bug_master_id(bug_obj))
+
+
+def get_bugs_state(bugs, release=None):
+    """Return a dict of (bug_is_fixed(), bug_get_master_id()) for each bug.
+
+    Each bug and its tasks are only fetched once, the bugs are fetched
+    concurrently, and their states are cached for a little while."""
+    result = {}
+    missing = []
+    for bug in dict.fromkeys(bugs):
+        state = _bug_states.get((str(bug), release))
+        if state is None:
+            missing.append(bug)
+        else:
+            result[bug] = state
+    states = _get_executor().map(lambda bug: _get_bug_state(bug, release), missing)
+    for bug, state in zip(missing, states):
+        ttl = BUG_STATE_ERROR_TTL if state == (None, None) else BUG_STATE_TTL
+        _bug_states.set((str(bug), release), state, ttl)
+        result[bug] = state
+    return result
+
+
+@_cached(ttl=24 * 60 * 60)
 def is_source_package(package_name):
     dev_series = get_devel_series_codename()
     series = _get_series(dev_series)
@@ -400,6 +560,7 @@ def is_source_package(package_name):
     return source_package is not None
 
 
+@_cached(ttl=24 * 60 * 60)
 def get_binaries_in_source_package(package_name, release=None):
     # FIXME: in the event that a package does not exist in the devel release
     # an empty set will be returned and binary packages from previous releases
@@ -408,7 +569,7 @@ def get_binaries_in_source_package(package_name, release=None):
         dev_series = get_devel_series_codename()
     else:
         dev_series = get_codename_for_version(release)
-    series = _get_series(dev_series)
+    series = _get_series_link(dev_series)
     if series is None:
         return ""
     sources = _ubuntu().main_archive.getPublishedSources(
@@ -425,25 +586,31 @@ def get_binaries_in_source_package(package_name, release=None):
     pbs = set()
     for binary in source.getPublishedBinaries():
         pbs.add(binary.binary_package_name)
-    return pbs
+    return sorted(pbs)
+
+
+def get_subscribed_source_packages(user):
+    """return source packages to which a user is subscribed"""
+    person = _get_launchpad().people[user]
+    return [src_pkg.name for src_pkg in person.getBugSubscriberPackages()]
 
 
 def get_subscribed_packages(user):
     """return binary packages to which a user is subscribed"""
-    person = _get_launchpad().people[user]
-    src_pkgs = [src_pkg.name for src_pkg in person.getBugSubscriberPackages()]
+    src_pkgs = get_subscribed_source_packages(user)
     bin_pkgs = []
     for src_pkg in src_pkgs:
         bin_pkgs.extend(list(get_binaries_in_source_package(src_pkg)))
     return bin_pkgs
 
 
+@_cached(ttl=24 * 60 * 60)
 def get_packages_in_packageset_name(release, name):
     if not release:
         series = get_devel_series_codename()
     else:
         series = get_codename_for_version(release)
-    series_obj = _get_series(series)
+    series_obj = _get_series_link(series)
     if series_obj is None:
         return ""
     try:
@@ -455,6 +622,7 @@ def get_packages_in_packageset_name(release, name):
     return list(packageset.getSourcesIncluded())
 
 
+@_cached(ttl=24 * 60 * 60)
 def is_valid_source_version(src_package, version):
     sources = _primary_archive().getPublishedSources(
         source_name=src_package,
@@ -464,23 +632,36 @@ def is_valid_source_version(src_package, version):
     return len(sources) >= 1
 
 
+def _pocket_ttl(pocket):
+    # A version published in the release, -updates or -security will stay
+    # there, while one in -proposed may soon migrate, and "?" may be a version
+    # which isn't published yet.
+    if pocket in ("Release", "Security", "Updates"):
+        return 30 * 24 * 60 * 60
+    if pocket == "?":
+        return NEGATIVE_TTL
+    return 60 * 60
+
+
+@_cached(ttl=_pocket_ttl)
 def get_pocket_for_source_version(src_package, version, release):
+    series_name = get_codename_for_version(release.split()[-1])
     # hack for packages from RTM
     if release == "Ubuntu RTM 14.09":
         distro = _get_launchpad().distributions["ubuntu-rtm"]
+        try:
+            series = distro.getSeries(name_or_version=series_name)
+        except (KeyError, HTTPError):
+            series = None
     else:
         distro = _ubuntu()
-    series_name = get_codename_for_version(release.split()[-1])
+        series = _get_series_link(series_name)
     kwargs = {
         "source_name": src_package,
         "version": version,
         "exact_match": True,
         "order_by_date": True,
     }
-    try:
-        series = distro.getSeries(name_or_version=series_name)
-    except (KeyError, HTTPError):
-        series = None
     if series is not None:
         kwargs["distro_series"] = series
     try:
@@ -490,6 +671,19 @@ def get_pocket_for_source_version(src_package, version, release):
         return "?"
 
 
+def get_pockets_for_source_versions(specific_versions):
+    """Return a dict of get_pocket_for_source_version() for each
+    (src_package, version, release) tuple supplied.
+
+    Each tuple is only looked up once, and the lookups are made
+    concurrently."""
+    specific_versions = list(dict.fromkeys(specific_versions))
+    pockets = _get_executor().map(
+        lambda args: get_pocket_for_source_version(*args), specific_versions
+    )
+    return dict(zip(specific_versions, pockets))
+
+
 # Bug creation.
 
 
@@ -11,7 +11,7 @@ import locale
 import re
 import time
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 from hashlib import md5, sha1
 
 from cassandra.cqlengine.query import BatchQuery
@@ -199,6 +199,7 @@ def bucket(oopsid, bucketid, fields=None, proposed_fields=False):
 
     cassandra_schema.Bucket.create(key=bucketid, column1=uuid.UUID(oopsid), value=b"")
     cassandra_schema.DayBuckets.create(key=day_key, key2=bucketid, column1=oopsid, value=b"")
+    touch_bucket(bucketid)
 
     if fields is not None:
         resolutions = (day_key[:4], day_key[:6], day_key)
@@ -223,6 +224,12 @@ def bucket(oopsid, bucketid, fields=None, proposed_fields=False):
     return day_key
 
 
+def touch_bucket(bucketid):
+    """Record that the data of a bucket changed, so that the API can tell
+    whether its clients already have the latest version of it."""
+    cassandra_schema.BucketLastWrites.create(key=bucketid, value=datetime.now(timezone.utc))
+
+
 def update_bucket_versions_count(crash_signature: str, release: str, version: str):
     cassandra_schema.BucketVersionsCount(
         key=crash_signature, column1=release, column2=version
@@ -286,6 +293,7 @@ def update_bucket_metadata(bucketid, source, version, comparator, release=""):
         metadata["Source"] = source
         for k, v in metadata.items():
             cassandra_schema.BucketMetadata.create(key=bucketid.encode(), column1=k, value=v)
+        touch_bucket(bucketid)
 
 
 def update_bucket_systems(bucketid, system, version=None):
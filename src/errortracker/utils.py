@@ -1,6 +1,9 @@
 import logging
 import re
-from datetime import datetime
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
 
 import apt
 import distro_info
@@ -173,6 +176,82 @@ def blocklisted_device(system_token):
     return False
 
 
+class TTLCache:
+    """A thread-safe in-memory cache, whose entries expire after `ttl`
+    seconds. When it holds more than `maxsize` entries, the least recently
+    used ones are evicted."""
+
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                return default
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Cores of crashes scoring at least this are put on the high priority retrace
+# queue, see retrace_priority().
+HIGH_PRIORITY_SCORE = 2
+# How many messages the retracers take from the high priority queue for each
+# one from the normal queue, when both have some.
+HIGH_PRIORITY_WEIGHT = 3
+
+
+def is_lts_or_devel_release(release: str) -> bool:
+    version = release.removeprefix("Ubuntu ")
+    for distro_release in UDI.get_all(result="object"):
+        if distro_release.version.replace(" LTS", "") == version:
+            return distro_release.version.endswith(" LTS") or (
+                distro_release.series == get_devel_series(result="codename")
+            )
+    return False
+
+
+def retrace_priority(release: str, awaiting: int, age: timedelta) -> int:
+    """How much retracing a core matters: the more reports are waiting for
+    its StacktraceAddressSignature to be retraced, the more users are
+    affected, and LTS and development releases matter most. Old reports
+    matter less."""
+    score = 0
+    if awaiting >= 10:
+        score += 2
+    elif awaiting >= 2:
+        score += 1
+    if release and is_lts_or_devel_release(release):
+        score += 1
+    if age > timedelta(days=7):
+        score -= 1
+    return score
+
+
+def get_retrace_queue(arch: str, release: str, awaiting: int, age: timedelta) -> str:
+    if retrace_priority(release, awaiting, age) >= HIGH_PRIORITY_SCORE:
+        return f"retrace_high_{arch}"
+    return f"retrace_{arch}"
+
+
 def get_lts_series(result: str) -> str:
     today = datetime.today().date()
     return UDI.lts(today, result=result)
@@ -23,6 +23,7 @@ import argparse
 import atexit
 import datetime
 import logging
+import multiprocessing
 import os
 import re
 import shutil
@@ -32,6 +33,7 @@ import sys
 import tempfile
 import time
 import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
 from subprocess import PIPE, Popen
 
@@ -40,13 +42,13 @@ import amqp
 # external libs
 from apport import Report
 from cassandra.marshal import float_pack, varint_pack
-from problem_report import CompressedValue, _base64_decoder
+from cassandra.query import SimpleStatement
 
 from daisy.metrics import get_metrics
 
 # internal libs
-from errortracker import amqp_utils, cassandra_schema, config, utils
-from errortracker.cassandra import setup_cassandra
+from errortracker import amqp_utils, cassandra_schema, config, cores, debcache, oopses, utils
+from errortracker.cassandra import cassandra_session, setup_cassandra
 from errortracker.swift_utils import get_swift_client
 
 apport_version_info = {}
@@ -61,6 +63,17 @@ LOGGING_FORMAT = "%(asctime)s:%(process)d:%(thread)d:%(levelname)s:%(name)s:%(me
 metrics = get_metrics("retracer.%s" % socket.gethostname())
 logger = logging.getLogger("retracer")
 
+# How often the queues are checked for new messages when they are empty, and
+# the pool mode checks for finished retraces, in seconds
+POLL_INTERVAL = 1
+# How long a retracer's claim on a StacktraceAddressSignature lasts, in
+# seconds, so that other cores with the same SAS are not retraced meanwhile.
+# It outlives the apport-retrace timeout, and expires if the retracer dies.
+CLAIM_TTL = 60 * 60
+
+# The Retracer of a pool mode worker process
+_worker_retracer = None
+
 
 def ensure_str(var):
     if isinstance(var, bytes):
@@ -143,6 +156,10 @@ class Retracer:
         cleanup_debs=False,
         stacktrace_source=False,
         failed=False,
+        jobs=1,
+        shared_cache=False,
+        deb_cache_size=0,
+        sandbox_size=0,
     ):
         signal.signal(signal.SIGTERM, self.exit_gracefully)
         setup_cassandra()
@@ -168,10 +185,23 @@ class Retracer:
         self.use_sandbox = use_sandbox
         self.cleanup_sandbox = cleanup_sandbox
         self.cleanup_debs = cleanup_debs
-
-        # determine path of gdb
-        gdb_which = Popen(["which", "gdb"], stdout=PIPE, universal_newlines=True)
-        self.gdb_path = gdb_which.communicate()[0].strip()
+        # In pool mode, up to `jobs` retraces are run at the same time by
+        # worker processes, see run_pool().
+        self.jobs = jobs
+        self._in_flight = set()
+        # Whether the sandbox and cache directories are shared with the other
+        # retracers of the host, see acquire_shared_cache().
+        self.shared_cache = shared_cache
+        self._shared_cache_lock = None
+        # The sandboxes are wiped when they get bigger than that many bytes,
+        # see debcache.trim_sandbox().
+        self.sandbox_size = sandbox_size
+        # The packages downloaded by apport are kept in a store shared by the
+        # retracers of the host, up to that many bytes, see DebCache.
+        self.deb_cache_size = deb_cache_size
+        self.deb_cache = None
+        if deb_cache_size and cache_debs and sandbox_dir:
+            self.deb_cache = debcache.DebCache(Path(sandbox_dir) / "debs", deb_cache_size)
 
         # determine path of apport-retrace
         which = Popen(["which", "apport-retrace"], stdout=PIPE, universal_newlines=True)
@@ -186,35 +216,160 @@ class Retracer:
         # 2018-03-14 do something with the core file
         # I think we'd need to make msg and oops_ids globals
         self._stop_now = True
-        if not self._processing_callback:
+        if not self._processing_callback and not self._in_flight:
             if self.channel:
                 self.channel.close()
             if self.connection:
                 self.connection.close()
             sys.exit()
 
-    def run_forever(self):
+    def get_queues(self):
+        """The queues to take messages from, and how many messages to take
+        from each one in turn."""
         if self.failed:
-            queue = f"failed_retrace_{self.architecture}"
-        else:
-            queue = f"retrace_{self.architecture}"
-        try:
-            self.connection = amqp_utils.get_connection()
-            self.channel = self.connection.channel()
+            return [(f"failed_retrace_{self.architecture}", 1)]
+        return [
+            (f"retrace_{self.architecture}", 1),
+            (f"retrace_high_{self.architecture}", utils.HIGH_PRIORITY_WEIGHT),
+        ]
+
+    def connect(self):
+        self.connection = amqp_utils.get_connection()
+        self.channel = self.connection.channel()
+        queues = self.get_queues()
+        for queue, _ in queues:
             self.channel.queue_declare(queue=queue, durable=True, auto_delete=False)
-            self.channel.basic_qos(0, 1, False)
-            tag = self.channel.basic_consume(callback=self.callback, queue=queue)
+        # Weighted round robin, highest priority first.
+        self._schedule = [
+            queue for queue, weight in sorted(queues, key=lambda q: -q[1]) for _ in range(weight)
+        ]
+        self._next = 0
+        return "Waiting for messages in %s." % " and ".join(f"`{queue}`" for queue, _ in queues)
+
+    def get_message(self):
+        """Get the next message to process, or None if all the queues are
+        empty. When they all have messages, each queue gets its weight's
+        worth of turns, so the high priority queue is served first without
+        starving the normal one."""
+        empty = set()
+        for _ in range(len(self._schedule)):
+            queue = self._schedule[self._next]
+            self._next = (self._next + 1) % len(self._schedule)
+            if queue in empty:
+                continue
+            msg = self.channel.basic_get(queue=queue)
+            if msg is not None:
+                return msg
+            empty.add(queue)
+        return None
+
+    def run_forever(self):
+        if self.jobs > 1:
+            return self.run_pool()
+        try:
+            waiting = self.connect()
+            log(f"{waiting} ^C to exit.")
+            while not self._stop_now:
+                msg = self.get_message()
+                if msg is None:
+                    time.sleep(POLL_INTERVAL)
+                    continue
+                self.callback(msg)
+                log(f"{waiting} ^C to exit.")
+        except KeyboardInterrupt:
+            log("Keyboard interrupt received, exiting properly")
+            self._stop_now = True
+        finally:
+            self.channel.close()
+            self.connection.close()
+
+    def run_pool(self):
+        """Take messages from the queues, handing each one to one of `jobs`
+        worker processes, which share their sandbox and cache directories.
+
+        Messages are only taken when a worker is free, and are ack'ed right
+        before being handed to it. On SIGTERM, no more messages are taken,
+        and the retraces in progress are waited for."""
+        executor = ProcessPoolExecutor(
+            max_workers=self.jobs,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.worker_options(),),
+        )
+
+        def dispatch(msg):
+            log("ack'ing message from queue")
+            msg.channel.basic_ack(msg.delivery_tag)
+            future = executor.submit(
+                _retrace_in_worker,
+                ensure_str(msg.body),
+                dict(msg.properties),
+                dict(msg.delivery_info),
+            )
+            self._in_flight.add(future)
+
+        try:
+            waiting = self.connect()
+            log(f"{waiting} with {self.jobs} workers. ^C to exit.")
             while not self._stop_now:
-                log(f"Waiting for messages in `{queue}`. ^C to exit.")
-                self.connection.drain_events()
+                if len(self._in_flight) < self.jobs:
+                    msg = self.get_message()
+                    if msg is not None:
+                        dispatch(msg)
+                        continue
+                if self._in_flight:
+                    done, _ = wait(
+                        self._in_flight, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED
+                    )
+                    self.reap(done)
+                else:
+                    time.sleep(POLL_INTERVAL)
         except KeyboardInterrupt:
             log("Keyboard interrupt received, exiting properly")
             self._stop_now = True
         finally:
+            if self._in_flight:
+                log("Waiting for %d retraces to finish" % len(self._in_flight))
+            self.reap(wait(self._in_flight)[0])
+            executor.shutdown()
             self.channel.close()
             self.connection.close()
-        if self.channel and self.channel.is_open:
-            self.channel.basic_cancel(tag)
+
+    def reap(self, futures):
+        for future in futures:
+            self._in_flight.discard(future)
+            try:
+                future.result()
+            except Exception:
+                log("Retrace failed in a worker: %s" % traceback.format_exc(), logging.ERROR)
+                metrics.meter("retrace.failed.worker")
+
+    def worker_options(self):
+        return {
+            "config_dir": self.config_dir,
+            "sandbox_dir": self.sandbox_dir,
+            "architecture": self.architecture,
+            "verbose": self.verbose,
+            "cache_debs": self.cache_debs,
+            "use_sandbox": self.use_sandbox,
+            "cleanup_sandbox": self.cleanup_sandbox,
+            "cleanup_debs": self.cleanup_debs,
+            "stacktrace_source": self.stacktrace_source,
+            "failed": self.failed,
+            "shared_cache": True,
+            "deb_cache_size": self.deb_cache_size,
+            "sandbox_size": self.sandbox_size,
+        }
+
+    def get_channel(self, msg):
+        """The channel to publish on while handling `msg`. Pool mode workers
+        get messages without a channel, and use their own."""
+        if msg.channel is not None:
+            return msg.channel
+        if self.channel is None:
+            self.connection = amqp_utils.get_connection()
+            self.channel = self.connection.channel()
+        return self.channel
 
     def update_retrace_stats(self, release, day_key, retracing_time, result):
         """
@@ -267,6 +422,15 @@ class Retracer:
             column1=count_key,
             value=varint_pack(mean[count_key]),
         )
+        # The API reads the means from RetracingTime, one partition per
+        # release and architecture, the Indexes ones are kept until every
+        # retracer writes both.
+        cassandra_schema.RetracingTime.create(
+            key="%s:%s" % (release, self.architecture),
+            column1=day_key,
+            value=mean[mean_key],
+            count=mean[count_key],
+        )
 
         # Report this into statsd as well.
         prefix = "timings.retracing"
@@ -283,6 +447,8 @@ class Retracer:
         metrics.timing(m, retracing_time)
 
     def setup_cache(self, sandbox_dir, release):
+        if self.shared_cache:
+            return self.acquire_shared_cache(sandbox_dir, release)
         if release in self._sandboxes:
             return self._sandboxes[release]
         sandbox_release = os.path.join(sandbox_dir, release)
@@ -306,6 +472,123 @@ class Retracer:
         self._sandboxes[release] = (sandbox, cache)
         return self._sandboxes[release]
 
+    def acquire_shared_cache(self, sandbox_dir, release):
+        """Lock a sandbox and cache directory of the release, shared with the
+        other retracers of the host, until release_shared_cache() is
+        called. A new one is created when they are all in use, so there are
+        as many of them as retraces of that release ran at the same time."""
+        shared, self._shared_cache_lock = debcache.acquire_shared_dir(
+            sandbox_dir, release, self.architecture
+        )
+        sandbox = None
+        if self.use_sandbox:
+            sandbox = shared / "sandbox"
+            sandbox.mkdir(exist_ok=True)
+            sandbox = str(sandbox)
+        cache = None
+        if self.cache_debs:
+            cache = shared / "cache"
+            cache.mkdir(exist_ok=True)
+            cache = str(cache)
+        return (sandbox, cache)
+
+    def release_shared_cache(self):
+        if self._shared_cache_lock is not None:
+            self._shared_cache_lock.close()
+            self._shared_cache_lock = None
+
+    def link_cached_debs(self, report, cache, release):
+        """Make the packages needed to retrace `report` which are in the deb
+        cache available to apport."""
+        try:
+            hits = self.deb_cache.link(
+                debcache.get_needed_packages(report), debcache.get_archives_dir(cache, release)
+            )
+        except OSError:
+            log("Could not use the deb cache: %s" % traceback.format_exc(), logging.ERROR)
+            return
+        log("Found %d packages in the deb cache" % hits)
+        metrics.meter("debcache.hit", hits)
+
+    def store_downloaded_debs(self, cache):
+        """Add the packages apport downloaded to the deb cache."""
+        try:
+            count, size = self.deb_cache.add(cache)
+        except OSError:
+            log("Could not update the deb cache: %s" % traceback.format_exc(), logging.ERROR)
+            return
+        log("Added %d packages (%d bytes) to the deb cache" % (count, size))
+        metrics.meter("debcache.miss", count)
+        metrics.meter("debcache.miss_bytes", size)
+
+    def get_retraced_signature(self, sas):
+        """The crash signature of a SAS that was successfully retraced, or
+        None."""
+        try:
+            crash_signature = cassandra_schema.Indexes.get(
+                key=b"crash_signature_for_stacktrace_address_signature", column1=sas
+            ).value.decode()
+            # daisy asks for another core when there is no stacktrace.
+            cassandra_schema.Stacktrace.get(key=sas.encode(), column1="Stacktrace")
+        except cassandra_schema.DoesNotExist:
+            return None
+        if crash_signature.startswith("failed:"):
+            return None
+        return crash_signature
+
+    def claim_retrace(self, sas, oops_id):
+        """Atomically mark the SAS as being retraced from this OOPS in the
+        retracing index. Returns False if another retrace of it is in
+        progress."""
+        session = cassandra_session()
+        claim = ("%s:%d:%s" % (socket.gethostname(), os.getpid(), oops_id)).encode()
+        # daisy writes an empty value when it queues a core, a claim that
+        # expired leaves no value.
+        for condition in ("value = 0x", "value = null"):
+            result = session.execute(
+                SimpleStatement(
+                    f'UPDATE {session.keyspace}."Indexes" USING TTL %s SET value = %s '
+                    f"WHERE key = %s AND column1 = %s IF {condition}"
+                ),
+                [CLAIM_TTL, claim, b"retracing", sas],
+            ).one()
+            if result["[applied]"]:
+                return True
+            # Requeued messages are already claimed.
+            if result.get("value") and result["value"].endswith((":%s" % oops_id).encode()):
+                return True
+            if result.get("value"):
+                return False
+        return False
+
+    def release_retrace(self, sas):
+        """Remove the claim on the SAS from the retracing index when its core
+        is not retraced, so that the next core of it is."""
+        if sas:
+            cassandra_schema.Indexes.objects.filter(key=b"retracing", column1=sas).delete()
+
+    def skip_duplicate(self, msg, oops_id, sas):
+        """Bucket the OOPS without retracing it if its SAS was already
+        successfully retraced, or drop its core if a retrace of the SAS is
+        in progress, which will bucket it. Returns whether it was
+        skipped."""
+        if not sas:
+            return False
+        crash_signature = self.get_retraced_signature(sas)
+        if crash_signature:
+            log("SAS already retraced, bucketing into %s" % crash_signature)
+            self.bucket([oops_id], crash_signature)
+            cassandra_schema.AwaitingRetrace.objects.filter(key=sas, column1=oops_id).delete()
+            metrics.meter("retrace.skipped.already_retraced")
+        elif not self.claim_retrace(sas, oops_id):
+            log("SAS already being retraced, dropping the core.")
+            metrics.meter("retrace.skipped.in_progress")
+        else:
+            return False
+        self.remove(oops_id)
+        self.update_time_to_retrace(msg)
+        return True
+
     def failed_to_process(self, msg, oops_id, old=False):
         # Try to remove the core file from the storage provider
         self.remove(oops_id)
@@ -320,14 +603,20 @@ class Retracer:
             log("Could not remove from the retracing row (%s) (%s):" % (oops_id, repr(e)))
 
     def write_swift_bucket_to_disk(self, key):
+        """Download the core `key` from Swift, decoding it on the fly to the
+        "core" file of a new work directory. CoreError is raised if it
+        cannot be decoded."""
         fmt = f"-swift.{key}.oopsid"
         path = Path(tempfile.mkdtemp(fmt))
         try:
-            _, body = self.swift.get_object(config.swift_bucket, key, resp_chunk_size=65536)
-            with open(path / "crash", "wb") as fp:
-                for chunk in body:
-                    fp.write(chunk)
+            headers, body = self.swift.get_object(config.swift_bucket, key, resp_chunk_size=65536)
+            log("Decompressing to %s" % (path / "core"))
+            size = cores.write_core(body, path / "core", etag=cores.get_etag(headers))
+            log("Decompressed %d bytes" % size)
             return path
+        except cores.CoreError:
+            rm_eff(path)
+            raise
         except Exception as e:
             log("Could not get %s from swift: %s" % (key, e))
             log(traceback.format_exc())
@@ -371,9 +660,11 @@ class Retracer:
 
         # ack the message very early, to prevent them from staying forever
         # in the queue in case the retracer gets OOM-killed or Cassandra is
-        # unreachable
-        log("ack'ing message from queue")
-        msg.channel.basic_ack(msg.delivery_tag)
+        # unreachable. In pool mode, it was ack'ed before being handed to
+        # this worker.
+        if msg.channel is not None:
+            log("ack'ing message from queue")
+            msg.channel.basic_ack(msg.delivery_tag)
 
         self.msg_body = ensure_str(msg.body)
         oops_id, provider = self.msg_body.split(":", 1)
@@ -402,52 +693,51 @@ class Retracer:
             self.remove(oops_id)
             return
 
+        # Several cores with the same SAS can be queued while a popular crash
+        # is being retraced, only retrace one of them.
+        sas = col.get("StacktraceAddressSignature", "")
+        if self.skip_duplicate(msg, oops_id, sas):
+            self._processing_callback = False
+            return
+
         # Check to see if there is an UnreportableReason so we can log more
         # information about failures to retrace.
         unreportable_reason = ""
         if "UnreportableReason" in list(col.keys()):
             unreportable_reason = col["UnreportableReason"]
 
-        work_path = self.write_bucket_to_disk(oops_id)
-
-        if not work_path or not work_path.exists():
-            log("Could not find %s" % work_path)
-            self.failed_to_process(msg, oops_id)
-            return
-
-        core_file = work_path / "core"
-        report_path = work_path / "crash"
-
         try:
-            with open(core_file, "wb") as fp:
-                log("Decompressing to %s" % core_file)
-                with open(report_path) as path_fp:
-                    for block in CompressedValue.decode_compressed_stream(
-                        _base64_decoder(path_fp)
-                    ):
-                        fp.write(block)
-        except Exception as e:
+            work_path = self.write_bucket_to_disk(oops_id)
+        except cores.CoreError as e:
             log("Failed to decompress core: %s" % str(e))
             # We couldn't decompress this, so there's no value in trying again.
             self.remove(oops_id)
+            self.release_retrace(sas)
             self.update_time_to_retrace(msg)
             # probably incomplete cores from armhf?
             metrics.meter("retrace.failed")
             metrics.meter("retrace.failed.%s" % self.architecture)
             metrics.meter("retrace.failure.decompression")
             metrics.meter("retrace.failure.decompression.%s" % self.architecture)
-            rm_eff(work_path)
             return
 
-        # confirm that gdb thinks the core file is good
-        gdb_cmd = [self.gdb_path, "--batch", "--ex", "target core %s" % core_file]
-        proc = Popen(gdb_cmd, stdout=PIPE, stderr=PIPE, universal_newlines=True, errors="ignore")
-        (out, err) = proc.communicate()
-        if "is truncated: expected core file size" in err or "not a core dump" in err:
+        if not work_path or not work_path.exists():
+            log("Could not find %s" % work_path)
+            self.failed_to_process(msg, oops_id)
+            return
+
+        core_file = work_path / "core"
+        report_path = work_path / "crash"
+
+        # confirm that the core file is good, before spending time on it
+        try:
+            cores.validate_core(core_file)
+        except cores.CoreError as e:
             # Not a core file, there's no value in trying again.
             self.remove(oops_id)
+            self.release_retrace(sas)
             self.update_time_to_retrace(msg)
-            log("Not a core dump per gdb.")
+            log("Not a valid core dump: %s" % e)
             if unreportable_reason:
                 log("UnreportableReason is: %s" % unreportable_reason)
             metrics.meter("retrace.failed")
@@ -501,6 +791,7 @@ class Retracer:
             metrics.meter("retrace.failed.invalid")
         if not release or invalid or not retraceable:
             self.remove(oops_id)
+            self.release_retrace(sas)
             self.update_time_to_retrace(msg)
             rm_eff(work_path)
             return
@@ -508,9 +799,12 @@ class Retracer:
         with open(report_path, "wb") as fp:
             report.write(fp)
 
+        sandbox = cache = None
         try:
             retrace_msg = "Retracing {}".format(self.msg_body)
             sandbox, cache = self.setup_cache(self.sandbox_dir, release)
+            if cache and self.deb_cache:
+                self.link_cached_debs(report, cache, release)
             day_key = time.strftime("%Y%m%d", time.gmtime())
 
             retracing_start_time = time.time()
@@ -570,16 +864,23 @@ class Retracer:
             metrics.meter("retrace.failed.to_setup.%s" % release)
             metrics.meter("retrace.failed.to_setup.%s" % architecture)
             metrics.meter("retrace.failed.to_setup.%s.%s" % (release, architecture))
+            self.release_retrace(sas)
             raise
         finally:
             if sandbox and self.cleanup_sandbox:
                 log("Removing %s" % sandbox)
                 shutil.rmtree(sandbox)
                 os.mkdir(sandbox)
+            elif sandbox and self.sandbox_size:
+                if debcache.trim_sandbox(sandbox, self.sandbox_size):
+                    log("Removed %s, which got too big" % sandbox)
+            if cache and self.deb_cache:
+                self.store_downloaded_debs(cache)
             if cache and self.cleanup_debs:
                 log("Removing %s" % cache)
                 shutil.rmtree(cache)
                 os.mkdir(cache)
+            self.release_shared_cache()
 
         try:
             if proc.returncode != 0:
@@ -649,6 +950,7 @@ class Retracer:
                         return
                 elif proc.returncode == -15:
                     log("apport-retrace was killed by retracer restart.")
+                    self.release_retrace(sas)
                     self._processing_callback = False
                     rm_eff(work_path)
                     return
@@ -708,9 +1010,7 @@ class Retracer:
                     retrace_result = "invalid_core"
                 # Remove the SAS from the retracing index so that we ask for
                 # another core
-                sas = report.get("StacktraceAddressSignature", "")
-                if sas:
-                    cassandra_schema.Indexes.objects.filter(key=b"retracing", column1=sas).delete()
+                self.release_retrace(report.get("StacktraceAddressSignature", ""))
                 self.update_retrace_stats(release, day_key, retracing_time, result=retrace_result)
                 metrics.meter("retrace.failed")
                 metrics.meter("retrace.failed.%s" % release)
@@ -995,6 +1295,7 @@ class Retracer:
                                 cassandra_schema.BucketRetraceFailureReason.objects.create(
                                     key=crash_signature.encode(), column1=k, value=v
                                 )
+                            oopses.touch_bucket(crash_signature)
                         metrics.meter("retrace.failure.outdated_packages")
                         metrics.meter("retrace.failure.%s.outdated_packages" % release)
                         metrics.meter("retrace.failure.%s.outdated_packages" % architecture)
@@ -1015,6 +1316,7 @@ class Retracer:
                             cassandra_schema.BucketRetraceFailureReason.objects.create(
                                 key=crash_signature.encode(), column1=k, value=v
                             )
+                        oopses.touch_bucket(crash_signature)
                 args = (release, day_key, retracing_time, "failed")
                 self.update_retrace_stats(*args)
                 metrics.meter("retrace.failed")
@@ -1079,7 +1381,7 @@ class Retracer:
                 self.bucket(oops_ids, crash_signature)
                 if self.rebucket(crash_signature):
                     log("Recounting %s" % crash_signature)
-                    self.recount(crash_signature, msg.channel)
+                    self.recount(crash_signature, self.get_channel(msg))
         finally:
             rm_eff(work_path)
 
@@ -1117,7 +1419,7 @@ class Retracer:
 
         body = amqp.Message(self.msg_body, timestamp=ts)
         body.properties["delivery_mode"] = 2
-        msg.channel.basic_publish(body, exchange="", routing_key=key)
+        self.get_channel(msg).basic_publish(body, exchange="", routing_key=key)
 
     def update_time_to_retrace(self, msg):
         """Record how long it took to retrace this crash, from the time we got
@@ -1189,6 +1491,21 @@ class Retracer:
         ).delete()
 
 
+def _init_worker(options):
+    global _worker_retracer
+    logging.basicConfig(format=LOGGING_FORMAT, level=logging.INFO)
+    _worker_retracer = Retracer(**options)
+    # The main process decides when to stop, once the retraces in progress
+    # are done.
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+
+def _retrace_in_worker(body, properties, delivery_info):
+    msg = amqp.Message(body, **properties)
+    msg.delivery_info = delivery_info
+    _worker_retracer.callback(msg)
+
+
 def parse_options():
     parser = argparse.ArgumentParser(description="Process core dumps.")
     parser.add_argument(
@@ -1240,6 +1557,27 @@ def parse_options():
         "--core-storage",
         help="Directory in which to store cores for manual investigation.",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Run up to that many retraces at the same time, in worker "
+        "processes sharing their sandbox and cache directories.",
+    )
+    parser.add_argument(
+        "--deb-cache-size",
+        type=int,
+        default=0,
+        help="Keep up to that many GiB of downloaded debs in a cache shared "
+        "by the retracers of the host, in the sandbox directory.",
+    )
+    parser.add_argument(
+        "--sandbox-size",
+        type=int,
+        default=0,
+        help="wipe the sandbox directory after a retrace when it is bigger than that many GiB.",
+    )
     parser.add_argument("-o", "--output", help="Log messages to a file.")
     parser.add_argument(
         "--no-stacktrace-source",
@@ -1286,6 +1624,9 @@ def main():
             options.cleanup_debs,
             options.stacktrace_source,
             failed=options.failed,
+            jobs=options.jobs,
+            deb_cache_size=options.deb_cache_size * 1024**3,
+            sandbox_size=options.sandbox_size * 1024**3,
         )
         retracer.run_forever()
     except:
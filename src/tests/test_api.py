@@ -0,0 +1,247 @@
+import datetime
+import json
+import os
+import threading
+import time
+from unittest.mock import patch
+from urllib.parse import quote
+
+import django
+import numpy
+import pytest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import Client, RequestFactory
+
+from errors import cassie
+from errortracker import cassandra_schema
+
+
+@pytest.fixture(scope="module")
+def django_setup():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "errors.settings")
+    django.setup()
+
+
+@pytest.fixture(scope="module")
+def client(django_setup):
+    return Client(HTTP_ACCEPT="application/json")
+
+
+@pytest.fixture(params=["orjson", "json"])
+def serializer(request, django_setup):
+    from errors.api import resources
+
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+        yield resources.JSONSerializer()
+    else:
+        with patch.object(resources, "orjson", None):
+            yield resources.JSONSerializer()
+
+
+class SyncThread(threading.Thread):
+    def start(self):
+        self.run()
+
+
+class TestApi:
+    def test_package_rates_of_crashes(self, client, datetime_now, cassandra_data):
+        """Test the rates of crashes of several packages are returned at once"""
+        packages = [
+            {
+                "release": "Ubuntu 24.04",
+                "package": "new-package",
+                "old_version": "0",
+                "new_version": "1",
+            },
+            {
+                "release": "Ubuntu 24.04",
+                "package": "no-crashes-today",
+                "old_version": "1",
+                "new_version": "2",
+                "phased_update_percentage": "100",
+            },
+        ]
+        response = client.post(
+            "/api/1.0/package-rates-of-crashes/",
+            json.dumps({"date": datetime_now.strftime("%Y%m%d"), "packages": packages}),
+            content_type="application/json",
+        )
+        assert response.status_code == 200
+        objects = json.loads(response.content)["objects"]
+        assert objects == [
+            {
+                "release": "Ubuntu 24.04",
+                "package": "new-package",
+                "old_version": "0",
+                "new_version": "1",
+                "increase": True,
+                "difference": 5,
+                "web_link": "http://testserver/?release=Ubuntu%2024.04&package=new-package&version=1",
+                "previous_period_in_days": None,
+                "previous_average": None,
+            },
+            {
+                "release": "Ubuntu 24.04",
+                "package": "no-crashes-today",
+                "old_version": "1",
+                "new_version": "2",
+                "increase": False,
+                "difference": None,
+                "web_link": None,
+                "previous_period_in_days": None,
+                "previous_average": None,
+            },
+        ]
+
+    def test_instances(self, client, cassandra_data):
+        """Test the lists of objects are streamed"""
+        bucket_id = "/usr/bin/already-bucketed:11:func1:main"
+        response = client.get("/api/1.0/instances/?id=%s" % quote(bucket_id))
+        assert response.status_code == 200
+        assert response.streaming
+        objects = json.loads(response.getvalue())["objects"]
+        assert sorted(obj["package_version"] for obj in objects) == ["1.0", "2.0"]
+
+    def test_bucket_etag(self, client, cassandra_data):
+        """Test the ETag of the responses about a bucket changes with each
+        write to it"""
+        bucket_id = "/usr/bin/already-bucketed:11:func1:main"
+        url = "/api/1.0/instances/?id=%s" % quote(bucket_id)
+        etags = []
+        for microsecond in (100000, 300000):
+            cassandra_schema.BucketLastWrites.create(
+                key=bucket_id, value=datetime.datetime(2025, 11, 1, 12, 0, 0, microsecond)
+            )
+            response = client.get(url)
+            assert response.status_code == 200
+            assert response["Last-Modified"] == "Sat, 01 Nov 2025 12:00:00 GMT"
+            etags.append(response["ETag"])
+            response = client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            assert response.status_code == 304
+        assert etags[0] != etags[1]
+
+    def test_package_rates_of_crashes_bad_request(self, client, cassandra_data):
+        """Test requests without a date or packages are rejected"""
+        response = client.post(
+            "/api/1.0/package-rates-of-crashes/",
+            json.dumps({"packages": []}),
+            content_type="application/json",
+        )
+        assert response.status_code == 400
+
+
+class TestJSONSerializer:
+    data = {
+        "objects": [
+            {
+                "value": numpy.float64(0.5),
+                "date": datetime.datetime(2025, 11, 1, 12, 0),
+                "package": "café",
+            }
+        ],
+        "meta": {"total": 1},
+    }
+
+    def test_to_json(self, serializer):
+        """Test the output is compact, sorted and not escaped"""
+        assert serializer.to_json(self.data) == (
+            '{"meta":{"total":1},'
+            '"objects":[{"date":"2025-11-01T12:00:00","package":"café","value":0.5}]}'
+        )
+
+    def test_to_json_pretty(self, serializer):
+        """Test the output is indented when asked to"""
+        assert serializer.to_json(self.data, {"pretty": True}) == json.dumps(
+            json.loads(serializer.to_json(self.data)),
+            indent=2,
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+
+    def test_stream_json(self, serializer):
+        """Test streamed lists are serialised like the whole documents"""
+        data = dict(self.data, objects=iter(self.data["objects"]))
+        assert "".join(serializer.stream_json(data)) == serializer.to_json(self.data)
+
+
+class TestCache:
+    @pytest.fixture(autouse=True)
+    def api_cache(self, django_setup):
+        from errors.api import cache
+
+        cache.get_cache().clear()
+        return cache
+
+    def test_miss_and_hit(self, api_cache):
+        """Test responses are computed once, and served with their headers"""
+        request = RequestFactory().get("/api/1.0/test/")
+        requests = []
+
+        def compute(request):
+            requests.append(request)
+            response = HttpResponse(b"[]", content_type="application/json")
+            response["Content-Disposition"] = "inline"
+            return response
+
+        first = api_cache.cached_response("test", request, compute, 60)
+        second = api_cache.cached_response("test", request, compute, 60)
+        assert requests == [request]
+        for response in first, second:
+            assert response.content == b"[]"
+            assert response["Content-Type"] == "application/json"
+            assert response["Content-Disposition"] == "inline"
+        assert first["ETag"] == second["ETag"]
+
+    def test_streaming_error(self, api_cache):
+        """Test a response which fails to stream is not cached"""
+        request = RequestFactory().get("/api/1.0/test/")
+
+        def content():
+            yield b"["
+            raise ValueError("Out of range float values are not JSON compliant")
+
+        with pytest.raises(ValueError):
+            api_cache.cached_response(
+                "test", request, lambda request: StreamingHttpResponse(content()), 60
+            )
+        assert api_cache.get_cache().get("test") is None
+        assert api_cache.get_cache().get("test:lock") is None
+
+    def test_refresh(self, api_cache):
+        """Test stale responses are served while they are recomputed, with a
+        copy of the request"""
+        request = RequestFactory().get("/api/1.0/test/?limit=2", HTTP_IF_NONE_MATCH='"1"')
+        requests = []
+
+        def compute(request):
+            requests.append(request)
+            return HttpResponse(b"%d" % len(requests))
+
+        assert api_cache.cached_response("test", request, compute, 60).content == b"1"
+        later = time.time() + 61
+        with patch.object(api_cache.time, "time", return_value=later), patch.object(
+            api_cache.threading, "Thread", SyncThread
+        ):
+            assert api_cache.cached_response("test", request, compute, 60).content == b"1"
+        refresh = requests[1]
+        assert refresh is not request
+        assert refresh.GET["limit"] == "2"
+        assert "HTTP_IF_NONE_MATCH" not in refresh.META
+        assert api_cache.cached_response("test", request, compute, 60).content == b"2"
+
+    def test_not_modified(self, client, temporary_db):
+        """Test clients get a 304 Not Modified for the cached responses"""
+        with patch.object(
+            cassie, "get_queue_lengths", return_value={"retrace_amd64": [[1, 2]]}
+        ) as get_queue_lengths:
+            response = client.get("/api/1.0/retracer-queue-length/")
+            assert response.status_code == 200
+            assert json.loads(response.content)["objects"] == [
+                {"queue": "retrace_amd64", "values": [[1, 2]]}
+            ]
+            response = client.get(
+                "/api/1.0/retracer-queue-length/", HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+            assert response.status_code == 304
+        assert get_queue_lengths.call_count == 1
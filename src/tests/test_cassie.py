@@ -1,11 +1,15 @@
 from datetime import datetime, timedelta
+from unittest.mock import patch
 from uuid import UUID
 
 import distro_info
 import numpy
+from cassandra.cqlengine import management
 from pytest import approx
 
 from errors import cassie
+from errortracker import cassandra
+from errortracker.cassandra_schema import AverageCrashes
 
 
 class TestCassie:
@@ -137,6 +141,80 @@ class TestCassie:
         )
         assert crash_rate == {"increase": False}
 
+    def test_get_package_crash_rates(self, datetime_now, cassandra_data):
+        """Test get_package_crash_rates returns the rate of each package"""
+        date = datetime_now.strftime("%Y%m%d")
+        packages = [
+            ("Ubuntu 24.04", "increase-rate", "1", "2", "70"),
+            ("Ubuntu 24.04", "no-crashes-today", "1", "2", "100"),
+            ("Ubuntu 24.04", "few-crashes", "1", "2", "100"),
+            ("Ubuntu 24.04", "new-package", "0", "1", "100"),
+            ("Ubuntu 24.04", "low-difference", "1", "2", "100"),
+            ("Ubuntu 24.04", "all-proposed", "1", "2", "100"),
+        ]
+        web_link = "https://errors.internal/?release=Ubuntu%2024.04&package={}&version={}"
+
+        crash_rates = cassie.get_package_crash_rates(packages, date, "https://errors.internal/")
+        assert len(crash_rates) == len(packages)
+        increase_rate, *crash_rates = crash_rates
+        assert increase_rate == approx(
+            {
+                "increase": True,
+                "difference": numpy.float64(4.7),
+                "web_link": web_link.format("increase-rate", "2"),
+                "previous_period_in_days": 30,
+                "previous_average": numpy.float64(0.7),
+            },
+            rel=1e-1,  # The time of the day is part of the computation
+        )
+        assert crash_rates == [
+            {"increase": False},
+            {"increase": False},
+            {
+                "increase": True,
+                "difference": 5,
+                "web_link": web_link.format("new-package", "1"),
+                "previous_average": None,
+            },
+            {"increase": False},
+            # The previous version had one crash on 3 days out of 30.
+            {
+                "increase": True,
+                "difference": 4,
+                "web_link": web_link.format("all-proposed", "2"),
+                "previous_period_in_days": 30,
+                "previous_average": 0,
+            },
+        ]
+
+        crash_rates = cassie.get_package_crash_rates(
+            packages, date, "https://errors.internal/", exclude_proposed=True
+        )
+        assert len(crash_rates) == len(packages)
+        increase_rate, *crash_rates = crash_rates
+        assert increase_rate == approx(
+            {
+                "increase": True,
+                "difference": numpy.float64(3.4),
+                "web_link": web_link.format("increase-rate", "2"),
+                "previous_period_in_days": 30,
+                "previous_average": numpy.float64(0.7),
+            },
+            rel=1e-1,
+        )
+        assert crash_rates == [
+            {"increase": False},
+            {"increase": False},
+            {
+                "increase": True,
+                "difference": 5,
+                "web_link": web_link.format("new-package", "1"),
+                "previous_average": None,
+            },
+            {"increase": False},
+            {"increase": False},
+        ]
+
     def test_bucket_exists_true(self, cassandra_data):
         """Test bucket_exists returns True for existing bucket"""
         assert cassie.bucket_exists("/usr/bin/already-bucketed:11:func1:main") is True
@@ -210,6 +288,8 @@ class TestCassie:
         signatures = cassie.get_signatures_for_bug(bug_number)
         assert isinstance(signatures, list)
         assert signatures == [bucket_id]
+        # The cached responses of the bucket don't have the bug
+        assert cassie.get_bucket_last_write(bucket_id) is not None
 
     def test_get_signatures_for_bug_nonexistent(self, cassandra_data):
         """Test get_signatures_for_bug returns empty list for non-existent bug"""
@@ -231,6 +311,33 @@ class TestCassie:
         crash_data = cassie.get_crash("not-a-uuid")
         assert crash_data == {}
 
+    def test_get_crashes(self, cassandra_data):
+        """Test get_crashes returns the same data as get_crash for each crash"""
+        bucket_id = "/usr/bin/already-bucketed:11:func1:main"
+        crashes = cassie.get_crashes_for_bucket(bucket_id)
+        cols = ["ExecutablePath", "StacktraceAddressSignature", "DuplicateSignature"]
+        result = cassie.get_crashes(crashes + ["not-a-uuid"], columns=cols)
+        assert result["not-a-uuid"] == {}
+        for crash in crashes:
+            assert result[str(crash)] == cassie.get_crash(str(crash), columns=cols)
+
+    def test_get_crashes_queries(self, cassandra_data):
+        """Test get_crashes reads each crash once, and looks up all of their
+        crash signatures with a single query"""
+        bucket_id = "/usr/bin/already-bucketed:11:func1:main"
+        crashes = [str(crash) for crash in cassie.get_crashes_for_bucket(bucket_id)]
+        cols = ["ExecutablePath", "StacktraceAddressSignature"]
+        session = cassandra.cassandra_session()
+        # Session.execute() goes through execute_async() too.
+        with patch.object(session, "execute_async", wraps=session.execute_async) as execute:
+            for crash in crashes:
+                cassie.get_crash(crash, columns=cols)
+            assert execute.call_count == 2 * len(crashes)
+            execute.reset_mock()
+            result = cassie.get_crashes(crashes, columns=cols)
+            assert execute.call_count == len(crashes) + 1
+        assert all(result[crash]["SAS"] for crash in crashes)
+
     def test_get_package_for_bucket(self, cassandra_data):
         """Test get_package_for_bucket returns package name and version"""
         bucket_id = "/usr/bin/already-bucketed:11:func1:main"
@@ -255,6 +362,50 @@ class TestCassie:
         result = cassie.get_problem_for_hash("nonexistent_hash_xyz")
         assert result is None
 
+    def test_get_problems_for_hashes(self, cassandra_data):
+        """Test get_problems_for_hashes only returns the existing hashes"""
+        result = cassie.get_problems_for_hashes(
+            ["6f2c361a80d2e8afd62563539e9618569e387b48", "nonexistent_hash_xyz"]
+        )
+        assert result == {
+            "6f2c361a80d2e8afd62563539e9618569e387b48": "/usr/bin/already-bucketed:11:func1:main"
+        }
+
+    def test_get_queue_lengths(self, cassandra_data):
+        """Test get_queue_lengths returns the recorded lengths per queue"""
+        from tools import record_queue_lengths
+
+        record_queue_lengths.record_queue_length("retrace_amd64", 12)
+        record_queue_lengths.record_queue_length("failed_retrace_amd64", 3)
+        result = cassie.get_queue_lengths(hours=1)
+        assert [v["value"] for v in result["retrace_amd64"]] == [12]
+        assert [v["value"] for v in result["failed_retrace_amd64"]] == [3]
+
+    def test_migrate_queue_lengths(self, cassandra_data):
+        """Test the queue lengths recorded in Indexes are moved, unless in a
+        dry run"""
+        import datetime
+
+        from errortracker import cassandra_schema
+        from tools import record_queue_lengths
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for minutes, length in [(10, b"5"), (20 * 24 * 60, b"7")]:
+            timestamp = (now - datetime.timedelta(minutes=minutes)).strftime("%Y%m%d%H%M")
+            cassandra_schema.Indexes.create(
+                key=b"retrace_queue_length", column1=f"retrace_arm64:{timestamp}", value=length
+            )
+        old_lengths = cassandra_schema.Indexes.objects.filter(key=b"retrace_queue_length")
+
+        assert record_queue_lengths.migrate_queue_lengths(dry_run=True) == 1
+        assert "retrace_arm64" not in cassie.get_queue_lengths(hours=1)
+        assert old_lengths.count() == 2
+
+        # The entry older than the 15 days kept is dropped.
+        assert record_queue_lengths.migrate_queue_lengths() == 1
+        assert [v["value"] for v in cassie.get_queue_lengths(hours=1)["retrace_arm64"]] == [5]
+        assert old_lengths.count() == 0
+
     def test_get_system_image_versions(self, cassandra_data):
         """Test get_system_image_versions returns list of versions"""
         # Test with a common image type
@@ -308,6 +459,29 @@ class TestCassie:
         result = cassie.get_stacktrace_for_bucket("nonexistent_bucket_12345")
         assert result == (None, None)
 
+    def test_get_bucket_summary(self, cassandra_data):
+        """Test get_bucket_summary gathers the same data as the single lookups"""
+        cassie._bucket_summaries.clear()
+        bucket_id = "/usr/bin/already-bucketed:11:func1:main"
+        summary = cassie.get_bucket_summary(bucket_id)
+        assert summary["source_package"] == "already-bucketed-src"
+        assert summary["metadata"] == cassie.get_metadata_for_bucket(bucket_id)
+        assert summary["retrace_failure"] == cassie.get_retrace_failure_for_bucket(bucket_id)
+        assert summary["traceback"] is None
+        assert (summary["stacktrace"], summary["thread_stacktrace"]) == (
+            cassie.get_stacktrace_for_bucket(bucket_id)
+        )
+        assert cassie.get_bucket_summary("nonexistent_bucket_12345") is None
+
+    def test_get_bucket_summary_written(self, cassandra_data):
+        """Test the cached summary of a bucket is not used after a write"""
+        cassie._bucket_summaries.clear()
+        bucket_id = "/usr/bin/already-bucketed:11:func1:main"
+        assert "CreatedBug" not in cassie.get_bucket_summary(bucket_id)["metadata"]
+        with patch.object(cassie.config, "lp_use_staging", False):
+            cassie.record_bug_for_bucket(bucket_id, 100124)
+        assert cassie.get_bucket_summary(bucket_id)["metadata"]["CreatedBug"] == "100124"
+
     def test_get_retrace_failure_for_bucket(self, cassandra_data):
         """Test get_retrace_failure_for_bucket returns failure data"""
         bucket_id = "/usr/bin/failed-retrace:11:failed_func:main"
@@ -339,6 +513,14 @@ class TestCassie:
             metadata["/usr/bin/failed-retrace:11:failed_func:main"]["Source"] == "failed-retrace"
         )
 
+    def test_get_metadata_for_buckets_with_release(self, cassandra_data):
+        """Test get_metadata_for_buckets uses the release specific FirstSeen and LastSeen"""
+        bucket_id = "/usr/bin/already-bucketed:11:func1:main"
+        metadata = cassie.get_metadata_for_buckets([bucket_id, "nonexistent"], "Ubuntu 24.04")
+        assert metadata[bucket_id]["FirstSeen"] == "1.0"
+        assert metadata[bucket_id]["LastSeen"] == "1.0"
+        assert metadata["nonexistent"] == {}
+
     def test_get_metadata_for_buckets_empty(self, cassandra_data):
         """Test get_metadata_for_buckets returns empty dict for empty list"""
         metadata = cassie.get_metadata_for_buckets([])
@@ -381,6 +563,27 @@ class TestCassie:
         packages = cassie.get_binary_packages_for_user("nonexistent_user_12345")
         assert packages is None
 
+    def test_get_binaries_in_source_package(self, cassandra_data):
+        """Test the source packages lookups read the imported packages"""
+        from errortracker.cassandra_schema import PackagesetPackages, SourceBinaryPackages
+
+        devel = cassie._release_or_devel(None)
+        for source, binary in [("util-linux", "fdisk"), ("util-linux", "util-linux")]:
+            SourceBinaryPackages.create(key=source, column1=devel, column2=binary)
+        SourceBinaryPackages.create(key="zsh", column1="Ubuntu 24.04", column2="zsh")
+        PackagesetPackages.create(key="Ubuntu 24.04", column1="shells", column2="zsh")
+
+        assert cassie.is_source_package("util-linux")
+        assert not cassie.is_source_package("zsh")
+        assert cassie.get_binaries_in_source_package("util-linux") == ["fdisk", "util-linux"]
+        assert cassie.get_binaries_in_source_package("zsh", "Ubuntu 24.04") == ["zsh"]
+        assert cassie.get_binaries_in_source_packages(["util-linux", "zsh"]) == [
+            "fdisk",
+            "util-linux",
+        ]
+        assert cassie.get_packages_in_packageset("Ubuntu 24.04", "shells") == ["zsh"]
+        assert cassie.get_packages_in_packageset("Ubuntu 24.04", "nonexistent") == []
+
     def test_get_package_new_buckets(self, cassandra_data):
         """Test get_package_new_buckets returns list of new crash buckets"""
         buckets = cassie.get_package_new_buckets("python-traceback", "1.0", "1.1")
@@ -504,6 +707,16 @@ class TestCassie:
         assert results[0][1][release]["amd64"] == 30.0
         assert results[2][1][release]["amd64"] == 40.0
 
+    def test_get_retracer_means_queries(self, cassandra_data):
+        """Test a year of mean retracing times is read with a slice query for
+        each release and architecture"""
+        releases = distro_info.UbuntuDistroInfo().supported()
+        session = cassandra.cassandra_session()
+        with patch.object(session, "execute_async", wraps=session.execute_async) as execute:
+            results = cassie.get_retracer_means(0, 365)
+        assert len(results) == 365
+        assert execute.call_count == len(releases) * 4
+
     def test_get_crash_count(self, datetime_now, cassandra_data):
         """Test get_crash_count returns generator of (date, count) tuples"""
         results = list(cassie.get_crash_count(0, 7))
@@ -537,6 +750,53 @@ class TestCassie:
         result = cassie.get_average_crashes("python3-traceback", "Ubuntu 99.99", days=7)
         assert result == []
 
+    def test_get_precomputed_average_crashes(self, cassandra_data):
+        """Test get_precomputed_average_crashes returns the materialised series"""
+        from tools import average_crashes_update
+
+        average_crashes_update.update_average_crashes("python3-traceback", "Ubuntu 24.04", 7)
+        result = cassie.get_precomputed_average_crashes(
+            ["python3-traceback", "nonexistent"], days=7
+        )
+        assert result["python3-traceback"] == cassie.get_average_crashes(
+            "python3-traceback", "Ubuntu 24.04", days=7
+        )
+        assert "nonexistent" not in result
+
+    def test_get_precomputed_average_crashes_partial(self, cassandra_data):
+        """Test series only materialised for the last days are not served for
+        longer ranges"""
+        from tools import average_crashes_update
+
+        average_crashes_update.update_average_crashes("python3-traceback:2", "Ubuntu 24.04", 2)
+        assert cassie.get_precomputed_average_crashes(["python3-traceback:2"], days=7) == {}
+        assert "python3-traceback:2" in cassie.get_precomputed_average_crashes(
+            ["python3-traceback:2"], days=2
+        )
+
+        # A run for the last days after a full one doesn't hide the full one.
+        average_crashes_update.update_average_crashes("python3-traceback:7", "Ubuntu 24.04", 7)
+        average_crashes_update.update_average_crashes("python3-traceback:7", "Ubuntu 24.04", 2)
+        assert "python3-traceback:7" in cassie.get_precomputed_average_crashes(
+            ["python3-traceback:7"], days=7
+        )
+
+    def test_get_precomputed_average_crashes_missing_table(self, cassandra_data):
+        """Test nothing is served until the table of the materialised series
+        is created"""
+        from tools import average_crashes_update
+
+        average_crashes_update.update_average_crashes("python3-traceback", "Ubuntu 24.04", 7)
+        management.drop_table(AverageCrashes)
+        try:
+            assert cassie.get_precomputed_average_crashes(["python3-traceback"], days=7) == {}
+        finally:
+            cassandra.create_missing_tables()
+        average_crashes_update.update_average_crashes("python3-traceback", "Ubuntu 24.04", 7)
+        assert "python3-traceback" in cassie.get_precomputed_average_crashes(
+            ["python3-traceback"], days=7
+        )
+
     def test_get_average_instances(self, datetime_now, cassandra_data):
         """Test get_average_instances returns generator of (timestamp, average) tuples"""
         yesterday = datetime_now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(
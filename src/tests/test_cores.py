@@ -0,0 +1,103 @@
+import base64
+import gzip
+import hashlib
+import os
+import struct
+
+from pytest import raises
+
+from errortracker import cores
+
+
+def _encode(core: bytes, line_size: int = 1024) -> bytes:
+    """Encode a core like apport does: gzip compressed, then base64 encoded in
+    lines."""
+    compressed = gzip.compress(core)
+    lines = [
+        base64.b64encode(compressed[i : i + line_size])
+        for i in range(0, len(compressed), line_size)
+    ]
+    return b"\n".join(lines) + b"\n"
+
+
+def _elf_core(segments, elf_type: int = 4) -> bytes:
+    """A 64-bit little endian ELF file with the given (type, offset, filesz)
+    program headers."""
+    header = b"\x7fELF\x02\x01\x01" + b"\0" * 9
+    header += struct.pack(
+        "<HHIQQQIHHHHHH", elf_type, 62, 1, 0, 64, 0, 0, 64, 56, len(segments), 0, 0, 0
+    )
+    for p_type, p_offset, p_filesz in segments:
+        header += struct.pack("<IIQQQQQQ", p_type, 0, p_offset, 0, 0, p_filesz, p_filesz, 0)
+    return header
+
+
+def _chunks(data: bytes, size: int = 1000):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+class TestCores:
+    def test_write_core(self, tmp_path):
+        """Test a core split in chunks across lines is decoded"""
+        core = os.urandom(100000) + b"\0" * 5000000
+        data = _encode(core)
+        etag = hashlib.md5(data).hexdigest()
+        size = cores.write_core(_chunks(data), tmp_path / "core", etag=f'"{etag}"')
+        assert size == len(core)
+        assert (tmp_path / "core").read_bytes() == core
+
+    def test_write_core_checksum(self, tmp_path):
+        """Test a core not matching the ETag of its object is rejected"""
+        with raises(cores.ChecksumError):
+            cores.write_core(_chunks(_encode(b"core")), tmp_path / "core", etag="0" * 32)
+
+    def test_get_etag(self):
+        """Test the ETag of large objects is not used as their checksum"""
+        assert cores.get_etag({"etag": "abc"}) == "abc"
+        assert cores.get_etag({"etag": "abc", "x-static-large-object": "True"}) is None
+        assert cores.get_etag({"etag": "abc", "x-object-manifest": "cores/abc"}) is None
+
+    def test_write_core_truncated(self, tmp_path):
+        """Test a truncated core is rejected"""
+        data = _encode(os.urandom(10000))
+        with raises(cores.CoreError):
+            cores.write_core(_chunks(data[: data.rindex(b"\n", 0, -1) + 1]), tmp_path / "core")
+
+    def test_write_core_invalid(self, tmp_path):
+        """Test data which isn't base64 nor gzip is rejected"""
+        with raises(cores.CoreError):
+            cores.write_core([b"I am an ELF binary. No, really."], tmp_path / "core")
+        with raises(cores.CoreError):
+            cores.write_core([base64.b64encode(b"I am an ELF binary.")], tmp_path / "core")
+
+    def test_write_core_too_big(self, tmp_path):
+        """Test cores bigger than the limit are rejected"""
+        data = _encode(b"\0" * 10000000)
+        with raises(cores.CoreError):
+            cores.write_core(_chunks(data), tmp_path / "core", max_size=5000000)
+
+    def test_validate_core(self, tmp_path):
+        """Test a complete core is valid"""
+        core = _elf_core([(4, 176, 100), (1, 276, 1000)])
+        (tmp_path / "core").write_bytes(core + b"\0" * 1100)
+        cores.validate_core(tmp_path / "core")
+
+    def test_validate_core_truncated(self, tmp_path):
+        """Test a core missing the end of a segment is rejected"""
+        core = _elf_core([(4, 176, 100), (1, 276, 1000)])
+        (tmp_path / "core").write_bytes(core + b"\0" * 1000)
+        with raises(cores.CoreError, match="truncated"):
+            cores.validate_core(tmp_path / "core")
+
+    def test_validate_core_not_a_core(self, tmp_path):
+        """Test files which aren't ELF cores are rejected"""
+        for data in [
+            b"",
+            b"I am an ELF binary. No, really.",
+            _elf_core([(4, 176, 100)], elf_type=2) + b"\0" * 100,
+            _elf_core([(1, 176, 100)]) + b"\0" * 100,
+            _elf_core([(4, 176, 100)])[:100],
+        ]:
+            (tmp_path / "core").write_bytes(data)
+            with raises(cores.CoreError):
+                cores.validate_core(tmp_path / "core")
@@ -0,0 +1,88 @@
+import os
+import time
+
+from errortracker import debcache
+
+
+def _download(cache_dir, name: str, size: int = 100):
+    """Write a package to the apt archives directory like apt would."""
+    archives = debcache.get_archives_dir(cache_dir, "Ubuntu 24.04")
+    archives.mkdir(parents=True, exist_ok=True)
+    (archives / name).write_bytes(name.encode().ljust(size, b"\0"))
+    return archives / name
+
+
+class TestDebCache:
+    def test_get_needed_packages(self):
+        """Test the package and dependencies of a report are found"""
+        report = {
+            "Package": "foo 1:1.0-1 [origin: Ubuntu]",
+            "Dependencies": "libc6 2.39-0ubuntu8\nlibbar1 2.0-1 [modified: usr/lib/libbar.so.1]",
+        }
+        assert debcache.get_needed_packages(report) == [
+            ("foo", "1:1.0-1"),
+            ("libc6", "2.39-0ubuntu8"),
+            ("libbar1", "2.0-1"),
+        ]
+
+    def test_add_and_link(self, tmp_path):
+        """Test the packages downloaded by a retracer are used by another one"""
+        cache = debcache.DebCache(tmp_path / "debs", 10000)
+        _download(tmp_path / "cache1", "foo_1%3a1.0-1_amd64.deb")
+        _download(tmp_path / "cache1", "foo-dbgsym_1%3a1.0-1_amd64.ddeb")
+        _download(tmp_path / "cache1", "libc6_2.39-0ubuntu8_amd64.deb")
+        assert cache.add(tmp_path / "cache1") == (3, 300)
+        # Only new packages are added.
+        assert cache.add(tmp_path / "cache1") == (0, 0)
+        assert cache.contains("foo", "1:1.0-1")
+        assert not cache.contains("foo", "1:1.0-2")
+
+        archives = debcache.get_archives_dir(tmp_path / "cache2", "Ubuntu 24.04")
+        assert cache.link([("foo", "1:1.0-1"), ("libbar1", "2.0-1")], archives) == 2
+        assert sorted(os.listdir(archives)) == [
+            "foo-dbgsym_1%3a1.0-1_amd64.ddeb",
+            "foo_1%3a1.0-1_amd64.deb",
+        ]
+        assert (archives / "foo_1%3a1.0-1_amd64.deb").read_bytes().startswith(b"foo_")
+
+    def test_evict(self, tmp_path):
+        """Test the least recently used packages are removed"""
+        cache = debcache.DebCache(tmp_path / "debs", 350)
+        for i, name in enumerate(["a_1_amd64.deb", "b_1_amd64.deb", "c_1_amd64.deb"]):
+            _download(tmp_path / "cache", name)
+            cache.add(tmp_path / "cache")
+            os.utime(cache.index / name[0] / name, (i, i))
+        archives = tmp_path / "archives"
+        # Using a package makes it the most recently used.
+        assert cache.link([("a", "1")], archives) == 1
+        _download(tmp_path / "cache", "d_1_amd64.deb")
+        cache.add(tmp_path / "cache")
+        assert len(os.listdir(cache.objects)) == 3
+        assert cache.link([("a", "1"), ("b", "1"), ("c", "1"), ("d", "1")], archives) == 3
+        assert not (cache.index / "b" / "b_1_amd64.deb").is_symlink()
+
+    def test_evict_old_download(self, tmp_path):
+        """Test packages are used from the time they are added, not from the
+        time apt gave them"""
+        cache = debcache.DebCache(tmp_path / "debs", 150)
+        _download(tmp_path / "cache1", "a_1_amd64.deb")
+        cache.add(tmp_path / "cache1")
+        an_hour_ago = time.time() - 3600
+        os.utime(cache.index / "a" / "a_1_amd64.deb", (an_hour_ago, an_hour_ago))
+        # Published years ago
+        os.utime(_download(tmp_path / "cache2", "b_1_amd64.deb"), (0, 0))
+        cache.add(tmp_path / "cache2")
+        assert not cache.contains("a", "1")
+        assert cache.contains("b", "1")
+
+    def test_trim_sandbox(self, tmp_path):
+        """Test a sandbox is only wiped once it is too big"""
+        sandbox = tmp_path / "sandbox"
+        (sandbox / "usr" / "lib").mkdir(parents=True)
+        (sandbox / "usr" / "lib" / "libfoo.so.1").write_bytes(b"\0" * 100)
+        (sandbox / "usr" / "lib" / "libbar.so.1").write_bytes(b"\0" * 100)
+        assert debcache.get_size(sandbox) == 200
+        assert not debcache.trim_sandbox(sandbox, 200)
+        assert debcache.trim_sandbox(sandbox, 150)
+        assert sandbox.is_dir()
+        assert os.listdir(sandbox) == []
@@ -0,0 +1,46 @@
+import random
+from uuid import UUID
+
+from pytest import approx, raises
+
+from errortracker.hyperloglog import HyperLogLog
+
+
+def _system_ids(count: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    return [UUID(int=rng.getrandbits(128)).hex * 2 for _ in range(count)]
+
+
+class TestHyperLogLog:
+    def test_count_small(self):
+        """Test small sets are counted exactly, with duplicates ignored"""
+        sketch = HyperLogLog()
+        assert sketch.count() == 0
+        sketch.update(["system1", "system2", "system3", "system1", b"system2"])
+        assert sketch.count() == 3
+
+    def test_count_accuracy(self):
+        """Test the estimation of a large set is within 2% of the exact count"""
+        systems = _system_ids(100000)
+        sketch = HyperLogLog()
+        sketch.update(systems)
+        assert sketch.count() == approx(len(set(systems)), rel=0.02)
+
+    def test_merge(self):
+        """Test merging daily sketches estimates the users of the whole period"""
+        rng = random.Random(1)
+        systems = _system_ids(50000)
+        days = [rng.sample(systems, 5000) for _ in range(90)]
+        exact = set()
+        merged = HyperLogLog()
+        for day in days:
+            exact.update(day)
+            sketch = HyperLogLog()
+            sketch.update(day)
+            merged.merge(HyperLogLog.from_bytes(sketch.to_bytes()))
+        assert merged.count() == approx(len(exact), rel=0.02)
+
+    def test_merge_different_precisions(self):
+        """Test sketches of different precisions cannot be merged"""
+        with raises(ValueError):
+            HyperLogLog().merge(HyperLogLog(precision=10))
@@ -0,0 +1,81 @@
+import json
+import pickle
+import time
+from unittest.mock import patch
+
+from errortracker import cassandra_schema, launchpad, utils
+
+
+class TestCached:
+    def test_shared_cache(self, temporary_db):
+        """Test the results are shared through the LaunchpadCache table"""
+        calls = []
+
+        @launchpad._cached(ttl=60)
+        def lookup_shared(package, release=None):
+            calls.append(package)
+            return ["1.0", "1.1"]
+
+        assert lookup_shared("zsh", release="Ubuntu 24.04") == ["1.0", "1.1"]
+        assert lookup_shared("zsh", release="Ubuntu 24.04") == ["1.0", "1.1"]
+        assert calls == ["zsh"]
+        row = cassandra_schema.LaunchpadCache.get(
+            key="lookup_shared", column1="('zsh', ('release', 'Ubuntu 24.04'))"
+        )
+        assert json.loads(row.value) == ["1.0", "1.1"]
+
+        # Like in another process
+        lookup_shared.local_cache.clear()
+        assert lookup_shared("zsh", release="Ubuntu 24.04") == ["1.0", "1.1"]
+        assert calls == ["zsh"]
+
+    def test_copies(self, temporary_db):
+        """Test callers can't change the cached results"""
+
+        @launchpad._cached(ttl=60)
+        def lookup_copies(package):
+            return ["1.0"]
+
+        lookup_copies("zsh").append("2.0")
+        assert lookup_copies("zsh") == ["1.0"]
+
+    def test_invalid_value(self, temporary_db):
+        """Test results that are not JSON are looked up again"""
+
+        @launchpad._cached(ttl=60)
+        def lookup_invalid(package):
+            return True
+
+        cassandra_schema.LaunchpadCache.create(
+            key="lookup_invalid", column1="('zsh',)", value=pickle.dumps(False)
+        )
+        assert lookup_invalid("zsh") is True
+        row = cassandra_schema.LaunchpadCache.get(key="lookup_invalid", column1="('zsh',)")
+        assert json.loads(row.value) is True
+
+
+class TestBugsState:
+    def setup_method(self):
+        launchpad._bug_states.clear()
+
+    def test_get_bugs_state(self):
+        """Test the state of each bug is fetched once, and cached"""
+        states = {"1": (True, None), "2": (False, "1")}
+        with patch.object(
+            launchpad, "_get_bug_state", side_effect=lambda bug, release: states[bug]
+        ) as get_bug_state:
+            assert launchpad.get_bugs_state(["1", "2", "1"]) == states
+            assert launchpad.get_bugs_state(["2", "1"]) == states
+        assert get_bug_state.call_count == 2
+
+    def test_get_bugs_state_error(self):
+        """Test the bugs which could not be fetched are looked up again soon"""
+        with patch.object(launchpad, "_get_bug_state", return_value=(None, None)) as get_bug_state:
+            assert launchpad.get_bugs_state(["3"]) == {"3": (None, None)}
+            assert launchpad.get_bugs_state(["3"]) == {"3": (None, None)}
+            assert get_bug_state.call_count == 1
+            later = time.monotonic() + launchpad.BUG_STATE_ERROR_TTL + 1
+            with patch.object(utils.time, "monotonic", return_value=later):
+                get_bug_state.return_value = (True, None)
+                assert launchpad.get_bugs_state(["3"]) == {"3": (True, None)}
+            assert get_bug_state.call_count == 2
@@ -191,9 +191,24 @@ class TestBucket:
                 )
             ]
 
+    def test_bucket_last_write(self, temporary_db):
+        """Test bucketing an OOPS records when the bucket last changed"""
+        from errors import cassie
+
+        assert cassie.get_bucket_last_write("bucket-key") is None
+        oopsid = str(uuid.uuid1())
+        oopses.insert(oopsid, json.dumps({"duration": 13000}))
+        now = datetime.datetime.now(datetime.timezone.utc)
+        before = now.replace(tzinfo=None, microsecond=0)
+        oopses.bucket(oopsid, "bucket-key")
+        last_write = cassie.get_bucket_last_write("bucket-key")
+        assert last_write >= before - datetime.timedelta(seconds=1)
+
     def test_update_bucket_metadata(self, temporary_db):
         import apt
 
+        from errors import cassie
+
         # Does not exist yet.
         oopses.update_bucket_metadata(
             "bucket-id",
@@ -202,6 +217,7 @@ class TestBucket:
             apt.apt_pkg.version_compare,
             "Ubuntu 12.04",
         )
+        assert cassie.get_bucket_last_write("bucket-id") is not None
         metadata = cassandra_schema.BucketMetadata.get_as_dict(key=b"bucket-id")
         assert metadata["Source"] == "whoopsie"
         assert metadata["FirstSeen"] == "1.2.3"
@@ -0,0 +1,58 @@
+import uuid
+
+from errortracker import cassandra_schema, debcache
+from tests.test_debcache import _download
+from tools import prefetch_debs
+
+
+def _await_retrace(sas, **fields):
+    oops_id = str(uuid.uuid1())
+    cassandra_schema.AwaitingRetrace.create(key=sas, column1=oops_id, value="")
+    for k, v in fields.items():
+        cassandra_schema.OOPS.create(key=oops_id.encode(), column1=k, value=v)
+
+
+class TestPrefetchDebs:
+    def test_get_waiting_reports(self, temporary_db):
+        """Test the reports waiting are grouped by release, architecture and
+        package version, most waited for first"""
+        foo = {"DistroRelease": "Ubuntu 24.04", "Architecture": "amd64", "Package": "foo 1.0-1"}
+        bar = {"DistroRelease": "Ubuntu 24.04", "Architecture": "amd64", "Package": "bar 2.0-1"}
+        for _ in range(2):
+            _await_retrace("/usr/bin/foo:11:func1:main", **foo)
+            _await_retrace("/usr/bin/bar:11:func1:main", **bar)
+        # Another crash of the same package version
+        _await_retrace("/usr/bin/foo:11:func2:main", **foo)
+        # Not retraceable
+        for _ in range(4):
+            _await_retrace(
+                "/usr/bin/ppa:11:func1:main",
+                **(foo | {"Package": "ppa 1.0-1 [origin: LP-PPA-someone]"}),
+            )
+            _await_retrace("/usr/bin/noarch:11:func1:main", **(foo | {"Architecture": ""}))
+        # The report is gone
+        cassandra_schema.AwaitingRetrace.create(
+            key="/usr/bin/gone:11:func1:main", column1=str(uuid.uuid1()), value=""
+        )
+
+        reports = prefetch_debs.get_waiting_reports(max_rows=1000, max_signatures=10)
+        assert [(fields["Package"], count) for fields, count in reports] == [
+            ("foo 1.0-1", 3),
+            ("bar 2.0-1", 2),
+        ]
+        assert reports[0][0]["DistroRelease"] == "Ubuntu 24.04"
+
+    def test_is_cached(self, tmp_path):
+        """Test a report is only cached with its debug symbols and its
+        dependencies"""
+        cache = debcache.DebCache(tmp_path / "debs", 10000)
+        fields = {"Package": "foo 1.0-1", "Dependencies": "libc6 2.39-0ubuntu8"}
+        _download(tmp_path / "cache", "foo_1.0-1_amd64.deb")
+        cache.add(tmp_path / "cache")
+        assert not prefetch_debs.is_cached(cache, fields)
+        _download(tmp_path / "cache", "foo-dbgsym_1.0-1_amd64.ddeb")
+        cache.add(tmp_path / "cache")
+        assert not prefetch_debs.is_cached(cache, fields)
+        _download(tmp_path / "cache", "libc6_2.39-0ubuntu8_amd64.deb")
+        cache.add(tmp_path / "cache")
+        assert prefetch_debs.is_cached(cache, fields)
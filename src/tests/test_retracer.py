@@ -1,6 +1,15 @@
 # -*- coding: utf8 -*-
+import tempfile
 import time
+import uuid
+from pathlib import Path
+from unittest.mock import patch
 
+import amqp
+import pytest
+
+import retracer as et_retracer
+from daisy import submit_core
 from errortracker import cassandra_schema
 
 
@@ -22,3 +31,129 @@ class TestSubmission:
         result = cassandra_schema.Indexes.get_as_dict(key=b"mean_retracing_time")
         assert result[mean_key] == 35
         assert result[counter_key] == 2
+        result = cassandra_schema.RetracingTime.get(
+            key=f"{release}:{retracer.architecture}", column1=day_key
+        )
+        assert result.value == 35
+        assert result.count == 2
+
+    def test_acquire_shared_cache(self, retracer):
+        """Test retraces of the same release running at the same time get
+        different shared directories, which are reused once released"""
+        retracer.shared_cache = retracer.use_sandbox = retracer.cache_debs = True
+        try:
+            sandbox, cache = retracer.setup_cache(retracer.sandbox_dir, "Ubuntu 24.04")
+            assert sandbox.endswith("Ubuntu 24.04/shared-amd64-0/sandbox")
+            assert cache.endswith("Ubuntu 24.04/shared-amd64-0/cache")
+            first = retracer._shared_cache_lock
+
+            sandbox, cache = retracer.setup_cache(retracer.sandbox_dir, "Ubuntu 24.04")
+            assert sandbox.endswith("Ubuntu 24.04/shared-amd64-1/sandbox")
+            retracer.release_shared_cache()
+            first.close()
+
+            sandbox, cache = retracer.setup_cache(retracer.sandbox_dir, "Ubuntu 24.04")
+            assert sandbox.endswith("Ubuntu 24.04/shared-amd64-0/sandbox")
+            retracer.release_shared_cache()
+        finally:
+            retracer.shared_cache = retracer.use_sandbox = retracer.cache_debs = False
+
+    def test_claim_retrace(self, retracer):
+        """Test only one retrace of a SAS can be in progress"""
+        sas = "/usr/bin/claimed:11:func1:main"
+        cassandra_schema.Indexes.create(key=b"retracing", column1=sas, value=b"")
+        assert retracer.claim_retrace(sas, "oops1")
+        assert not retracer.claim_retrace(sas, "oops2")
+        # The same OOPS, requeued after a transient error
+        assert retracer.claim_retrace(sas, "oops1")
+        # Not queued by daisy, e.g. from the failed queue
+        assert retracer.claim_retrace("/usr/bin/unqueued:11:func1:main", "oops3")
+
+    def test_claim_retrace_queued(self, retracer):
+        """Test queueing another core of a SAS doesn't reset its claim"""
+        sas = "/usr/bin/claimed-queued:11:func1:main"
+        submit_core.mark_retracing(sas)
+        assert retracer.claim_retrace(sas, "oops1")
+        submit_core.mark_retracing(sas)
+        assert not retracer.claim_retrace(sas, "oops2")
+
+    def test_invalid_core_releases_claim(self, retracer):
+        """Test the claim on a SAS is released when its core is not retraced,
+        so that the next core of the SAS is retraced"""
+        sas = "/usr/bin/invalid-core:11:func1:main"
+        cassandra_schema.Indexes.create(key=b"retracing", column1=sas, value=b"")
+        oops_ids = [str(uuid.uuid1()), str(uuid.uuid1())]
+        for oops_id in oops_ids:
+            cassandra_schema.OOPS.create(
+                key=oops_id.encode(), column1="StacktraceAddressSignature", value=sas
+            )
+
+        def write_bucket_to_disk(oops_id):
+            work_path = Path(tempfile.mkdtemp())
+            (work_path / "core").write_bytes(b"not a core")
+            return work_path
+
+        retracing = cassandra_schema.Indexes.objects.filter(key=b"retracing", column1=sas)
+        with patch.object(retracer, "remove"), patch.object(
+            retracer, "write_bucket_to_disk", side_effect=write_bucket_to_disk
+        ) as write:
+            retracer.callback(amqp.Message(f"{oops_ids[0]}:swift"))
+            assert retracing.count() == 0
+            # The second core of the SAS is not dropped as being retraced.
+            retracer.callback(amqp.Message(f"{oops_ids[1]}:swift"))
+            assert write.call_count == 2
+            assert retracing.count() == 0
+
+    def test_setup_failure_releases_claim(self, retracer):
+        """Test the claim on a SAS is released when the retrace set up fails"""
+        sas = "/usr/bin/setup-failure:11:func1:main"
+        submit_core.mark_retracing(sas)
+        oops_id = str(uuid.uuid1())
+        fields = {
+            "StacktraceAddressSignature": sas,
+            "DistroRelease": "Ubuntu 24.04",
+            "Package": "setup-failure 1.0",
+        }
+        for k, v in fields.items():
+            cassandra_schema.OOPS.create(key=oops_id.encode(), column1=k, value=v)
+
+        def write_bucket_to_disk(oops_id):
+            work_path = Path(tempfile.mkdtemp())
+            (work_path / "core").write_bytes(b"a core")
+            return work_path
+
+        with patch.object(retracer, "write_bucket_to_disk", side_effect=write_bucket_to_disk):
+            with patch.object(et_retracer.cores, "validate_core"), patch.object(
+                retracer, "setup_cache", side_effect=OSError("No space left on device")
+            ):
+                with pytest.raises(OSError):
+                    retracer.callback(amqp.Message(f"{oops_id}:swift"))
+        retracing = cassandra_schema.Indexes.objects.filter(key=b"retracing", column1=sas)
+        assert retracing.count() == 0
+
+    def test_get_retraced_signature(self, retracer):
+        """Test only SASes retraced with a stacktrace are considered retraced"""
+        for sas, signature in [
+            ("/usr/bin/retraced:11:func1:main", b"retraced:func1:main"),
+            ("/usr/bin/failed:11:func1:main", b"failed:/usr/bin/failed:11:func1:main"),
+        ]:
+            cassandra_schema.Indexes.create(
+                key=b"crash_signature_for_stacktrace_address_signature",
+                column1=sas,
+                value=signature,
+            )
+            cassandra_schema.Stacktrace.create(
+                key=sas.encode(), column1="Stacktrace", value="#0 func1"
+            )
+        cassandra_schema.Indexes.create(
+            key=b"crash_signature_for_stacktrace_address_signature",
+            column1="/usr/bin/no-stacktrace:11:func1:main",
+            value=b"no-stacktrace:func1:main",
+        )
+        assert (
+            retracer.get_retraced_signature("/usr/bin/retraced:11:func1:main")
+            == "retraced:func1:main"
+        )
+        assert retracer.get_retraced_signature("/usr/bin/failed:11:func1:main") is None
+        assert retracer.get_retraced_signature("/usr/bin/no-stacktrace:11:func1:main") is None
+        assert retracer.get_retraced_signature("/usr/bin/unknown:11:func1:main") is None
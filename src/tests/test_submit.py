@@ -319,3 +319,28 @@ class TestCoreSubmission:
 
         # did we mark this as retracing in Cassandra?
         assert cassandra_schema.Indexes.get(key=b"retracing").column1 == stack_addr_sig
+
+    def test_core_submission_high_priority(self, client, temporary_db):
+        uuid = "12345678-1234-5678-1234-567812345679"
+        stack_addr_sig = "/usr/bin/bar:11:/usr/bin/bar+1e071"
+        cassandra_schema.OOPS.create(
+            key=uuid.encode(), column1="StacktraceAddressSignature", value=stack_addr_sig
+        )
+        cassandra_schema.OOPS.create(
+            key=uuid.encode(), column1="SystemIdentifier", value=stack_addr_sig
+        )
+        # Lots of reports are waiting for that SAS to be retraced
+        for i in range(10):
+            cassandra_schema.AwaitingRetrace.create(
+                key=stack_addr_sig, column1=f"12345678-1234-5678-1234-5678123456{i:02}", value=""
+            )
+
+        response = client.post(f"/{uuid}/submit-core/amd64/{sha512_system_uuid}", data="core")
+        assert response.status_code == 200
+
+        with amqp_utils.get_connection() as c:
+            ch = c.channel()
+            message = ch.basic_get(queue="retrace_high_amd64")
+            assert message.body == f"{uuid}:swift"
+            ch.basic_ack(message.delivery_tag)
+            ch.close()
@@ -0,0 +1,38 @@
+import time
+from unittest.mock import patch
+
+from errortracker import utils
+
+
+class TestTTLCache:
+    def test_get_set(self):
+        cache = utils.TTLCache(ttl=60)
+        assert cache.get("key") is None
+        assert cache.get("key", "default") == "default"
+        cache.set("key", "value")
+        assert cache.get("key") == "value"
+        cache.clear()
+        assert cache.get("key") is None
+
+    def test_expiry(self):
+        """Test the entries expire after the TTL of the cache, or their own"""
+        cache = utils.TTLCache(ttl=60)
+        cache.set("key", "value")
+        cache.set("short", "value", ttl=10)
+        now = time.monotonic()
+        with patch.object(utils.time, "monotonic", return_value=now + 30):
+            assert cache.get("key") == "value"
+            assert cache.get("short") is None
+        with patch.object(utils.time, "monotonic", return_value=now + 90):
+            assert cache.get("key") is None
+
+    def test_maxsize(self):
+        """Test the least recently used entries are evicted"""
+        cache = utils.TTLCache(ttl=60, maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == 1
+        cache.set("c", 3)
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+
+# Materialise the average crashes per user series displayed on the front page
+# of errors, so that the average-crashes API can serve it with a single read
+# instead of reading Counters and UniqueUsers90Days for every visitor.
+# This needs to run after unique_users_daily_update.py, and can be run again
+# during the day with --days 2 to pick up the most recent crashes.
+
+import argparse
+import datetime
+
+import distro_info
+
+from errors import cassie
+from errortracker import cassandra, cassandra_schema
+
+# The materialised values are rewritten on every run, keep them a bit longer so
+# that a missed run doesn't leave holes in the graph, but still let them expire
+# once they are out of the window, or if this job stops running.
+TTL = 30 * 24 * 60 * 60
+# The series are only served once a run materialised all of the days displayed,
+# and until a daily run is missed.
+DAYS_TTL = 2 * 24 * 60 * 60
+
+UDI = distro_info.UbuntuDistroInfo()
+
+
+def get_releases(days: int) -> list[str]:
+    """The releases that may have had users in the last `days` days."""
+    today = datetime.date.today()
+    start = today - datetime.timedelta(days=days)
+    releases = []
+    for release in UDI.get_all(result="object"):
+        eol = getattr(release, "eol_esm", None) or release.eol
+        if release.created <= today and (eol is None or eol >= start):
+            releases.append("Ubuntu " + release.version.replace(" LTS", ""))
+    return releases
+
+
+def update_average_crashes(field: str, release: str, days: int, dry_run: bool = False) -> int:
+    averages = cassie.get_average_crashes(field, release, days)
+    if not dry_run:
+        for t, avg in averages:
+            date = datetime.date.fromtimestamp(t).strftime("%Y%m%d")
+            cassandra_schema.AverageCrashes.ttl(TTL).create(key=field, column1=date, value=avg)
+        record_materialised_days(field, days)
+    return len(averages)
+
+
+def record_materialised_days(field: str, days: int):
+    """Record that the last `days` days of the series of `field` were
+    materialised, unless a longer run did, so that a run for the last few
+    days doesn't make the rest of the series look materialised."""
+    try:
+        previous = cassandra_schema.Indexes.get(key=cassie.AVERAGE_CRASHES_DAYS, column1=field)
+        if int(previous.value) > days:
+            return
+    except cassandra_schema.DoesNotExist:
+        pass
+    cassandra_schema.Indexes.ttl(DAYS_TTL).create(
+        key=cassie.AVERAGE_CRASHES_DAYS, column1=field, value=str(days).encode()
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Materialise the average crashes series.")
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Compute the series without recording them",
+    )
+    parser.add_argument(
+        "--days",
+        type=int,
+        default=360,
+        metavar="DAYS",
+        help="Number of days to (re)compute, starting from today (default: 360)",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    cassandra.setup_cassandra()
+
+    for release in get_releases(args.days):
+        # Those are the two fields the front page combines for each release.
+        for field in (release, "RecoverableProblem:" + release):
+            count = update_average_crashes(field, release, args.days, args.dry_run)
+            print(f"{field}: {count} days")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+
+# Older buckets were created before the Source field was written in their
+# BucketMetadata. The most common problems API used to find their package by
+# looking at the OOPSes of the bucket on every request. This fills in the
+# missing Source fields once and for all, using that same lookup.
+
+import argparse
+
+from errors import cassie
+from errortracker import cassandra, cassandra_schema, oopses
+
+# How many buckets to check for a Source field at once
+BATCH_SIZE = 1000
+
+
+def backfill_sources(bucketids: list[str], dry_run: bool = False) -> int:
+    """Fill in the Source metadata of the given buckets that don't have one.
+    Returns the number of buckets updated."""
+    results = cassandra.execute_concurrent(
+        'SELECT value FROM {keyspace}."BucketMetadata" WHERE key = ? AND column1 = ?',
+        [(bucketid.encode(), "Source") for bucketid in bucketids],
+    )
+    updated = 0
+    for bucketid, rows in zip(bucketids, results):
+        if rows and rows[0]["value"]:
+            continue
+        source, _ = cassie.get_package_for_bucket(bucketid)
+        if not source:
+            continue
+        print(f"{bucketid}: {source}")
+        if not dry_run:
+            cassandra_schema.BucketMetadata.create(
+                key=bucketid.encode(), column1="Source", value=source
+            )
+            oopses.touch_bucket(bucketid)
+        updated += 1
+    return updated
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fill in the missing bucket Source metadata.")
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only print the sources that would be recorded",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    cassandra.setup_cassandra()
+
+    total = 0
+    updated = 0
+    batch = []
+    buckets = cassandra_schema.BucketMetadata.objects.distinct(["key"]).limit(None)
+    for bucket in buckets:
+        batch.append(bucket.key.decode())
+        if len(batch) == BATCH_SIZE:
+            updated += backfill_sources(batch, args.dry_run)
+            total += len(batch)
+            batch = []
+    if batch:
+        updated += backfill_sources(batch, args.dry_run)
+        total += len(batch)
+    print(f"Went through {total} buckets, filled in the Source of {updated}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@
 import sqlite3
 from urllib.request import urlretrieve
 
-from errortracker import cassandra
+from errortracker import cassandra, oopses
 
 cassandra.setup_cassandra()
 session = cassandra.cassandra_session()
@@ -27,6 +27,7 @@ def import_bug_numbers(path):
         print(f"Inserting LP: #{crash_id} as '{signature}'")
         session.execute(bm_table_insert, [signature.encode("utf-8"), str(crash_id)])
         session.execute(b2c_table_insert, [crash_id, signature])
+        oopses.touch_bucket(signature)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,111 @@
+#!/usr/bin/python3
+
+# Record which binary packages are built from each source package, and which
+# source packages are in each packageset, for every supported release. The
+# most common problems API reads them from SourceBinaryPackages and
+# PackagesetPackages instead of asking Launchpad on every request.
+#
+# The rows are written with a TTL of a few days, so packages which are not
+# published anymore go away by themselves as long as this runs daily.
+
+import argparse
+import sys
+import traceback
+
+from launchpadlib.launchpad import Launchpad
+
+from errortracker import cassandra, config, utils
+
+# How long the imported rows are kept, in seconds
+TTL = 3 * 24 * 60 * 60
+# The architecture whose binaries are imported. Architecture independent
+# binaries are published in it as well.
+ARCHITECTURE = "amd64"
+# How many rows are inserted at once
+BATCH_SIZE = 1000
+
+
+def release_name(codename) -> str:
+    for release in utils.UDI.get_all(result="object"):
+        if release.series == codename:
+            return "Ubuntu %s" % release.version.replace(" LTS", "")
+    raise ValueError(f"Unknown series {codename}")
+
+
+def insert(query, rows):
+    for i in range(0, len(rows), BATCH_SIZE):
+        cassandra.execute_concurrent(query, rows[i : i + BATCH_SIZE])
+
+
+def import_source_packages(archive, series, release, dry_run=False):
+    print(f"Fetching the {ARCHITECTURE} binaries of {release}")
+    das = series.getDistroArchSeries(archtag=ARCHITECTURE)
+    rows = set()
+    for binary in archive.getPublishedBinaries(distro_arch_series=das, status="Published"):
+        rows.add((binary.source_package_name, release, binary.binary_package_name))
+    print(f"Found {len(rows)} binaries")
+    if not dry_run:
+        insert(
+            'INSERT INTO {keyspace}."SourceBinaryPackages" (key, column1, column2) '
+            f"VALUES (?, ?, ?) USING TTL {TTL}",
+            sorted(rows),
+        )
+
+
+def import_packagesets(launchpad, series, release, dry_run=False):
+    print(f"Fetching the packagesets of {release}")
+    rows = []
+    for packageset in launchpad.packagesets.getBySeries(distroseries=series):
+        sources = packageset.getSourcesIncluded()
+        print(f" {packageset.name}: {len(sources)} sources")
+        rows.extend((release, packageset.name, source) for source in sources)
+    if not dry_run:
+        insert(
+            'INSERT INTO {keyspace}."PackagesetPackages" (key, column1, column2) '
+            f"VALUES (?, ?, ?) USING TTL {TTL}",
+            rows,
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Import the binaries of each source package and the packagesets."
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only print what would be imported",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    cassandra.setup_cassandra()
+
+    # Like errortracker/launchpad.py
+    service_root = "qastaging" if config.lp_use_staging == "True" else "production"
+    launchpad = Launchpad.login_anonymously("source-packages", service_root)
+    ubuntu = launchpad.distributions["ubuntu"]
+    archive = ubuntu.getArchive(name="primary")
+
+    failed = []
+    for codename in utils.get_supported_series(result="codename"):
+        release = release_name(codename)
+        # Carry on with the other releases, the rows of this one expire if it
+        # keeps failing.
+        try:
+            series = ubuntu.getSeries(name_or_version=codename)
+            import_source_packages(archive, series, release, args.dry_run)
+            import_packagesets(launchpad, series, release, args.dry_run)
+        except Exception:
+            print(f"Could not import {release}:")
+            traceback.print_exc()
+            failed.append(release)
+    if failed:
+        sys.exit("Failed to import %s" % ", ".join(failed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/python3
+
+# Copy the mean retracing times from the "mean_retracing_time" row of Indexes
+# to the RetracingTime table, which the API now reads. The retracers write
+# both since the introduction of RetracingTime, so this only needs to run
+# once, to bring over the history.
+
+import argparse
+
+from cassandra.marshal import float_unpack, varint_unpack
+
+from errortracker import cassandra, cassandra_schema
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Migrate the mean retracing times.")
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only print the means that would be copied",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    cassandra.setup_cassandra()
+
+    means = {}
+    counts = {}
+    rows = cassandra_schema.Indexes.objects.filter(key=b"mean_retracing_time").limit(None)
+    for row in rows:
+        # "20251101:Ubuntu 24.04:amd64" and "20251101:Ubuntu 24.04:amd64:count"
+        if row.column1.endswith(":count"):
+            counts[row.column1.removesuffix(":count")] = row.value
+        else:
+            means[row.column1] = row.value
+
+    for key, mean in means.items():
+        day, release_arch = key.split(":", 1)
+        mean = float_unpack(mean)
+        count = varint_unpack(counts.get(key, b"\x00"))
+        print(f"{day} {release_arch}: {mean} ({count})")
+        if not args.dry_run:
+            cassandra_schema.RetracingTime.create(
+                key=release_arch, column1=day, value=mean, count=count
+            )
+    print(f"Migrated {len(means)} means")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/python3
+
+# Download and unpack the packages needed to retrace the crashes which have
+# the most reports waiting for a core, before the cores arrive, so that the
+# retracers find them in the deb cache and in their shared sandboxes. After
+# an SRU, the first cores of the new versions used to pay for downloading
+# and unpacking all of their debug symbols.
+#
+# Reports are written to AwaitingRetrace when they come in and a core is
+# requested for their StacktraceAddressSignature. They are grouped by
+# release, architecture and package version, and the groups with the most
+# reports waiting whose packages are not in the deb cache yet are warmed up.
+# This runs on the retracer hosts, with the same sandbox directory as the
+# retracers.
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import traceback
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from apport import Report
+from apport.sandboxutils import make_sandbox
+
+from errortracker import cassandra, cassandra_schema, debcache, utils
+
+# The fields of the reports apport needs to know which packages to install
+FIELDS = [
+    "Architecture",
+    "Dependencies",
+    "DistroRelease",
+    "ExecutablePath",
+    "Package",
+    "ProcMaps",
+]
+
+
+def get_waiting_reports(max_rows, max_signatures):
+    """The fields of a report for each release, architecture and package
+    version, with the number of reports of these waiting to be retraced,
+    most waited for first."""
+    waiting = Counter()
+    examples = {}
+    rows = cassandra_schema.AwaitingRetrace.objects.all().limit(max_rows)
+    for sas, oops_id in rows.values_list("key", "column1"):
+        waiting[sas] += 1
+        examples.setdefault(sas, oops_id)
+
+    groups = Counter()
+    reports = {}
+    for sas, count in waiting.most_common(max_signatures):
+        fields = cassandra_schema.OOPS.get_as_dict(key=examples[sas].encode(), column1__in=FIELDS)
+        release = fields.get("DistroRelease", "")
+        package = fields.get("Package", "")
+        architecture = fields.get("Architecture", "")
+        if not architecture or not package:
+            continue
+        if not utils.retraceable_release(release) or not utils.retraceable_package(package):
+            continue
+        key = (release, architecture, package)
+        groups[key] += count
+        reports.setdefault(key, fields)
+    return [(reports[key], count) for key, count in groups.most_common()]
+
+
+def is_cached(deb_cache, fields) -> bool:
+    """Whether the package of the report, its debug symbols and its
+    dependencies are all in the deb cache."""
+    packages = debcache.get_needed_packages(fields)
+    if not packages:
+        return False
+    name, version = packages[0]
+    if not deb_cache.contains(name, version, debcache.DEBUG_SUFFIXES[1:]):
+        return False
+    return all(deb_cache.contains(name, version, ("",)) for name, version in packages)
+
+
+def warm_up(fields, config_dir, sandbox_dir, deb_cache_size, cleanup_debs, sandbox_size):
+    report = Report()
+    for k, v in fields.items():
+        try:
+            report[k] = v
+        except (AssertionError, ValueError):
+            continue
+    release = report["DistroRelease"]
+    shared, lock = debcache.acquire_shared_dir(sandbox_dir, release, report["Architecture"])
+    try:
+        sandbox = shared / "sandbox"
+        sandbox.mkdir(exist_ok=True)
+        # Like the retracers, before adding to it
+        if sandbox_size:
+            debcache.trim_sandbox(sandbox, sandbox_size)
+        cache = shared / "cache"
+        cache.mkdir(exist_ok=True)
+        deb_cache = None
+        if deb_cache_size:
+            deb_cache = debcache.DebCache(Path(sandbox_dir) / "debs", deb_cache_size)
+            deb_cache.link(
+                debcache.get_needed_packages(report), debcache.get_archives_dir(cache, release)
+            )
+        make_sandbox(report, config_dir, cache_dir=str(cache), sandbox_dir=str(sandbox))
+        if deb_cache:
+            deb_cache.add(cache)
+        if cleanup_debs:
+            shutil.rmtree(cache)
+            cache.mkdir()
+    finally:
+        lock.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Warm up the retracer sandboxes for the crashes waiting for a core."
+    )
+    parser.add_argument(
+        "--config-dir", required=True, help="Packaging system configuration base directory."
+    )
+    parser.add_argument(
+        "--sandbox-dir", required=True, help="The sandbox directory of the retracers."
+    )
+    parser.add_argument(
+        "--deb-cache-size",
+        type=int,
+        default=0,
+        help="The size of the deb cache of the retracers, in GiB.",
+    )
+    parser.add_argument(
+        "--sandbox-size",
+        type=int,
+        default=0,
+        help="The size over which the retracers wipe a shared sandbox, in GiB.",
+    )
+    parser.add_argument(
+        "--cleanup-debs",
+        action="store_true",
+        help="wipe the deb cache directory after warming up a sandbox.",
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=2, help="How many sandboxes to warm up at the same time"
+    )
+    parser.add_argument(
+        "--limit", type=int, default=20, help="How many sandboxes to warm up at most"
+    )
+    parser.add_argument(
+        "--max-rows",
+        type=int,
+        default=100000,
+        help="How many reports waiting to be retraced to look at",
+    )
+    parser.add_argument(
+        "--max-signatures",
+        type=int,
+        default=500,
+        help="How many of the most waited for signatures to look at",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only print the packages that would be prefetched",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    deb_cache_size = args.deb_cache_size * 1024**3
+
+    cassandra.setup_cassandra()
+
+    # Like the retracers
+    http_proxy = os.environ.get("retracer_http_proxy")
+    if http_proxy:
+        os.environ["http_proxy"] = http_proxy
+
+    deb_cache = None
+    if deb_cache_size:
+        deb_cache = debcache.DebCache(Path(args.sandbox_dir) / "debs", deb_cache_size)
+    todo = []
+    for fields, count in get_waiting_reports(args.max_rows, args.max_signatures):
+        if deb_cache and is_cached(deb_cache, fields):
+            continue
+        print(
+            "%s (%s, %s): %d reports waiting"
+            % (fields["Package"], fields["DistroRelease"], fields["Architecture"], count)
+        )
+        todo.append(fields)
+        if len(todo) >= args.limit:
+            break
+    if args.dry_run:
+        return
+
+    executor = ProcessPoolExecutor(
+        max_workers=args.jobs, mp_context=multiprocessing.get_context("spawn")
+    )
+    with executor:
+        futures = {
+            executor.submit(
+                warm_up,
+                fields,
+                args.config_dir,
+                args.sandbox_dir,
+                deb_cache_size,
+                args.cleanup_debs,
+                args.sandbox_size * 1024**3,
+            ): fields
+            for fields in todo
+        }
+        for future in as_completed(futures):
+            package = futures[future]["Package"]
+            try:
+                future.result()
+                print(f"Warmed up {package}")
+            except Exception:
+                print(f"Could not warm up {package}:")
+                traceback.print_exc()
+
+
+if __name__ == "__main__":
+    main()
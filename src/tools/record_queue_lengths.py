@@ -8,32 +8,48 @@ from errortracker import amqp_utils, cassandra, cassandra_schema
 ARCHES = ["amd64", "arm64", "armhf", "i386"]
 
 
-def record_queue_length(queue: str, length: int):
+# How long the recorded lengths are kept by default
+KEEP_DAYS = 15
+
+
+def record_queue_length(queue: str, length: int, keep_days: int = KEEP_DAYS):
     now = datetime.datetime.now(datetime.timezone.utc)
-    timestamp = now.strftime("%Y%m%d%H%M")
-    column1 = f"{queue}:{timestamp}"
-    cassandra_schema.Indexes.create(
-        key=b"retrace_queue_length", column1=column1, value=str(length).encode()
+    cassandra_schema.RetraceQueueLengths.ttl(keep_days * 24 * 60 * 60).create(
+        key=now.strftime("%Y%m%d"),
+        column1=now.strftime("%Y%m%d%H%M"),
+        column2=queue,
+        value=length,
     )
 
 
-def prune_queue_lengths(days: int) -> int | None:
+def migrate_queue_lengths(keep_days: int = KEEP_DAYS, dry_run: bool = False) -> int:
+    """Move the lengths recorded in the retrace_queue_length row of Indexes
+    to RetraceQueueLengths, keeping them for what remains of `keep_days`,
+    and return how many were moved."""
     now = datetime.datetime.now(datetime.timezone.utc)
-    cutoff = now - datetime.timedelta(days=days)
-    cutoff_str = cutoff.strftime("%Y%m%d%H%M")
-    try:
-        rows = cassandra_schema.Indexes.objects.filter(key=b"retrace_queue_length").all()
-    except cassandra_schema.DoesNotExist:
-        return
-
-    pruned = 0
+    rows = cassandra_schema.Indexes.objects.filter(key=b"retrace_queue_length").limit(None)
+    migrated = 0
     for row in rows:
-        timestamp = row.column1.split(":", 1)[1]
-        if timestamp < cutoff_str:
-            print(f"  Removing {row.column1} ({row.value.decode()})")
-            row.delete()
-            pruned += 1
-    print(f"Pruned {pruned} entries older than {days} days.")
+        queue, timestamp = row.column1.split(":", 1)
+        recorded = datetime.datetime.strptime(timestamp, "%Y%m%d%H%M").replace(
+            tzinfo=datetime.timezone.utc
+        )
+        ttl = int((recorded + datetime.timedelta(days=keep_days) - now).total_seconds())
+        if ttl <= 0:
+            continue
+        if dry_run:
+            print(f"  Would migrate {row.column1} ({row.value.decode()})")
+        else:
+            cassandra_schema.RetraceQueueLengths.ttl(ttl).create(
+                key=timestamp[:8], column1=timestamp, column2=queue, value=int(row.value)
+            )
+        migrated += 1
+    if dry_run:
+        print(f"Would migrate {migrated} entries from Indexes.")
+        return migrated
+    cassandra_schema.Indexes.objects.filter(key=b"retrace_queue_length").delete()
+    print(f"Migrated {migrated} entries from Indexes.")
+    return migrated
 
 
 def parse_args():
@@ -44,10 +60,16 @@ def parse_args():
         help="Print queue lengths without recording them",
     )
     parser.add_argument(
-        "--prune-days",
+        "--keep-days",
         type=int,
+        default=KEEP_DAYS,
         metavar="DAYS",
-        help="Remove queue length entries older than DAYS",
+        help=f"Expire queue length entries after DAYS (default: {KEEP_DAYS})",
+    )
+    parser.add_argument(
+        "--migrate",
+        action="store_true",
+        help="Move the queue lengths recorded in Indexes to RetraceQueueLengths",
     )
     return parser.parse_args()
 
@@ -57,10 +79,10 @@ def main():
 
     cassandra.setup_cassandra()
 
-    if args.prune_days:
-        prune_queue_lengths(args.prune_days)
+    if args.migrate:
+        migrate_queue_lengths(args.keep_days, args.dry_run)
 
-    for queue_prefix in ["retrace", "failed_retrace"]:
+    for queue_prefix in ["retrace", "retrace_high", "failed_retrace"]:
         for arch in ARCHES:
             queue = f"{queue_prefix}_{arch}"
             length = amqp_utils.get_queue_length(queue)
@@ -69,7 +91,7 @@ def main():
                 continue
             print(f"{queue}: {length}")
             if not args.dry_run:
-                record_queue_length(queue, length)
+                record_queue_length(queue, length, args.keep_days)
 
 
 if __name__ == "__main__":
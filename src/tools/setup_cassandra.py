@@ -17,3 +17,6 @@ logger = config.logger
 logger.addHandler(logging.StreamHandler(sys.stdout))
 
 cassandra.setup_cassandra()
+# The keyspace is only synced when it is created, the tables added to the
+# schema since then need to be created explicitly.
+cassandra.create_missing_tables()
@@ -108,8 +108,9 @@ def main():
     skipped_count = 0
     deduplicate_count = 0
     queued = set()
-    for arch in ["amd64", "arm64"]:
-        queue = f"retrace_{arch}"
+    queues = [f"retrace_{arch}" for arch in ["amd64", "arm64"]]
+    queues += [f"retrace_high_{arch}" for arch in ["amd64", "arm64"]]
+    for queue in queues:
         channel.queue_declare(queue=queue, durable=True, auto_delete=False)
         messages = list()
         while True:
@@ -7,12 +7,19 @@ import distro_info
 from cassandra.query import SimpleStatement
 
 from errortracker import cassandra
+from errortracker.hyperloglog import HyperLogLog
 
 cassandra.setup_cassandra()
 session = cassandra.cassandra_session()
 
 UDI = distro_info.UbuntuDistroInfo()
 
+# Crashes can be reported some time after they happened, so the sketches of
+# the most recent days are rebuilt every time.
+REBUILD_DAYS = 7
+# Keep the sketches for as long as they are part of the 90 days window.
+SKETCH_TTL = 100 * 24 * 60 * 60
+
 
 # Utilities
 def _date_range_iterator(start, finish):
@@ -23,6 +30,45 @@ def _date_range_iterator(start, finish):
         start += datetime.timedelta(days=1)
 
 
+def get_day_users(release, date):
+    hex_daterelease = ("%s:%s" % (release, date)).encode()
+    # column1 is the system uuid
+    results = session.execute(
+        SimpleStatement(
+            f'SELECT column1 FROM {session.keyspace}."DayUsers" WHERE key=%s', fetch_size=10000
+        ),
+        [hex_daterelease],
+    )
+    for row in results:
+        yield row["column1"]
+
+
+def get_day_sketch(release, date, rebuild, dry_run):
+    """The HyperLogLog sketch of the users of `release` on `date`, built from
+    DayUsers if it isn't recorded yet, or if `rebuild` is set."""
+    if not rebuild:
+        results = session.execute(
+            SimpleStatement(
+                f'SELECT value FROM {session.keyspace}."DayUsersSketch" WHERE key=%s and column1=%s'
+            ),
+            [release, date],
+        )
+        for row in results:
+            return HyperLogLog.from_bytes(row["value"])
+
+    sketch = HyperLogLog()
+    sketch.update(get_day_users(release, date))
+    if not dry_run:
+        session.execute(
+            SimpleStatement(
+                f'INSERT INTO {session.keyspace}."DayUsersSketch" (key, column1, value) '
+                "VALUES (%s, %s, %s) USING TTL %s"
+            ),
+            [release, date, sketch.to_bytes(), SKETCH_TTL],
+        )
+    return sketch
+
+
 # Main
 def main():
     if "--dry-run" in sys.argv:
@@ -30,6 +76,14 @@ def main():
         sys.argv.remove("--dry-run")
     else:
         dry_run = False
+    # Count the users exactly, by loading all of them in memory, instead of
+    # merging the daily HyperLogLog sketches. Only useful to check the
+    # estimations.
+    if "--exact" in sys.argv:
+        exact = True
+        sys.argv.remove("--exact")
+    else:
+        exact = False
 
     releases = [
         "Ubuntu " + r.replace(" LTS", "")
@@ -45,22 +99,24 @@ def main():
     for release in releases:
         print(f"Updating {release}")
         i = _date_range_iterator(d - datetime.timedelta(days=89), d)
+        rebuild_from = (d - datetime.timedelta(days=REBUILD_DAYS - 1)).strftime("%Y%m%d")
         users = set()
+        sketch = HyperLogLog()
         day_count = 0
         for date in i:
             print(f"  processing {date} - ", end="")
             day_count += 1
-            user_count = 0
-            hex_daterelease = ("%s:%s" % (release, date)).encode()
-            # column1 is the system uuid
-            results = session.execute(
-                SimpleStatement(f'SELECT column1 FROM {session.keyspace}."DayUsers" WHERE key=%s'),
-                [hex_daterelease],
-            )
-            rows = [row for row in results]
-            user_count += len(rows)
-            users.update([row["column1"] for row in rows])
-            print(f"found {user_count} users")
+            if exact:
+                user_count = 0
+                for user in get_day_users(release, date):
+                    user_count += 1
+                    users.add(user)
+                print(f"found {user_count} users")
+            else:
+                day_sketch = get_day_sketch(release, date, date >= rebuild_from, dry_run)
+                sketch.merge(day_sketch)
+                print(f"found ~{day_sketch.count()} users")
+        user_count = len(users) if exact else sketch.count()
         # value is the number of users
         uu_results = session.execute(
             SimpleStatement(
@@ -73,16 +129,16 @@ def main():
         except IndexError:
             uu_count = 0
         print(("Was %s" % uu_count))
-        print(("Now %s" % len(users)))
+        print(("Now %s" % user_count))
         if not dry_run:
             session.execute(
                 SimpleStatement(
                     "INSERT INTO %s.\"%s\" (key, column1, value) \
                              VALUES ('%s', '%s', %d)"
-                    % (session.keyspace, "UniqueUsers90Days", release, formatted, len(users))
+                    % (session.keyspace, "UniqueUsers90Days", release, formatted, user_count)
                 )
             )
-        print(("%s:%s" % (release, len(users))))
+        print(("%s:%s" % (release, user_count)))
         print(("from %s days" % day_count))
 
 